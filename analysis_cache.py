@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import time
+import chess
+import chess.polyglot
+
+# --- Persistent Analysis Cache ---
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".chess_trainer", "analysis.sqlite3")
+EVICTION_INTERVAL = 256 # Writes between checks of the size bound
+
+class AnalysisCache:
+    # Search results (score + best move) keyed by Zobrist hash and depth, shared by every trainer process on the machine.
+    # SQLite in WAL mode lets any number of readers run alongside one writer; all errors just count as a miss.
+    # Hits only note their last use in memory, so reads never take the write lock: the times are written with the next put or on close
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=200000):
+        self.max_entries, self.writes, self.used = max_entries, 0, {} # (key, depth) -> time of the last hit not yet written
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS analysis (key INTEGER, depth INTEGER, score INTEGER, move TEXT, last_used REAL, PRIMARY KEY (key, depth)) WITHOUT ROWID")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS analysis_last_used ON analysis (last_used)")
+
+    @staticmethod
+    def _key(board):
+        key = chess.polyglot.zobrist_hash(board)
+        return key - (1 << 64) if key >= 1 << 63 else key # SQLite integers are signed 64-bit
+
+    def get(self, board, depth):
+        # Best move from the deepest stored search of at least this depth, or None
+        key = self._key(board)
+        try:
+            row = self.connection.execute("SELECT depth, move FROM analysis WHERE key = ? AND depth >= ? ORDER BY depth DESC LIMIT 1", (key, depth)).fetchone()
+        except sqlite3.Error: return None
+        if row is None: return None
+        self.used[key, row[0]] = time.time()
+        move = chess.Move.from_uci(row[1])
+        return move if move in board.legal_moves else None
+
+    def put(self, board, depth, score, move):
+        try:
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self.connection.execute("INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?, ?)", (self._key(board), depth, score, move.uci(), time.time()))
+                self._write_used()
+            self.writes += 1
+            if self.writes % EVICTION_INTERVAL == 0: self.evict()
+        except sqlite3.Error: pass
+
+    def _write_used(self):
+        # Inside the caller's transaction
+        self.connection.executemany("UPDATE analysis SET last_used = MAX(last_used, ?) WHERE key = ? AND depth = ?", [(used, key, depth) for (key, depth), used in self.used.items()])
+        self.used.clear()
+
+    def evict(self):
+        # Drops the least recently used rows once the table is over max_entries
+        excess = self.connection.execute("SELECT COUNT(*) FROM analysis").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self.connection.execute("DELETE FROM analysis WHERE (key, depth) IN (SELECT key, depth FROM analysis ORDER BY last_used LIMIT ?)", (excess,))
+
+    def close(self):
+        try:
+            if self.used:
+                with self.connection:
+                    self.connection.execute("BEGIN")
+                    self._write_used()
+        except sqlite3.Error: pass
+        self.connection.close()
+
+def open_cache(path=DEFAULT_CACHE_PATH, max_entries=200000):
+    # The cache is an optimisation only, so a location that can't be opened just means running without one
+    try: return AnalysisCache(path, max_entries)
+    except (OSError, sqlite3.Error): return None
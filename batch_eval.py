@@ -0,0 +1,50 @@
+import chess
+import numpy as np
+from engine import SQUARE_VALUES, KING_VALUES
+
+# --- Batch Evaluation ---
+# Row order of the (N, 12) bitboard arrays: white pawn..king, then black pawn..king
+PIECE_ORDER = [(color, piece_type) for color in (chess.WHITE, chess.BLACK) for piece_type in chess.PIECE_TYPES]
+
+def _table(values_for):
+    return np.array([values_for(color, piece_type) for color, piece_type in PIECE_ORDER], dtype=np.int64)
+
+# (12, 64) signed material + PST tables built from the same piece_score / piece_position_scores as evaluate_board.
+# Kings only appear in the two phase tables, which are picked per board by its piece count
+PIECE_TABLE = _table(lambda color, piece_type: [0] * 64 if piece_type == chess.KING else SQUARE_VALUES[color][piece_type])
+KING_TABLES = [_table(lambda color, piece_type: KING_VALUES[color][phase] if piece_type == chess.KING else [0] * 64) for phase in (0, 1)]
+
+def piece_masks(board):
+    return [board.pieces_mask(piece_type, color) for color, piece_type in PIECE_ORDER]
+
+def evaluate_masks(masks):
+    # Material + piece-square score for every row of an (N, 12) array of piece bitboards.
+    # Bitboards carry no side to move, so checkmate/stalemate/insufficient material are not detected here
+    masks = np.asarray(masks, dtype=np.uint64).reshape(-1, len(PIECE_ORDER)).astype('<u8')
+    squares = np.unpackbits(masks.view(np.uint8).reshape(len(masks), len(PIECE_ORDER), 8), axis=2, bitorder='little')
+    piece_counts = squares.sum(axis=(1, 2))
+    king_scores = np.where(piece_counts <= 7, np.einsum('nps,ps->n', squares, KING_TABLES[1]), np.einsum('nps,ps->n', squares, KING_TABLES[0]))
+    return np.einsum('nps,ps->n', squares, PIECE_TABLE) + king_scores
+
+def evaluate_boards(boards):
+    # Same scores as calling evaluate_board on each board, computed as one array operation
+    boards = list(boards)
+    scores = evaluate_masks([piece_masks(board) for board in boards])
+    for i, board in enumerate(boards):
+        if board.is_checkmate(): scores[i] = -99999 if board.turn == chess.WHITE else 99999
+        elif board.is_stalemate() or board.is_insufficient_material(): scores[i] = 0
+    return scores
+
+def evaluate_children(board, moves=None):
+    # Scores every child of board (or just the given moves) in one call, e.g. for a whole frontier node
+    moves = list(board.legal_moves) if moves is None else list(moves)
+    masks, game_over_scores = [], {}
+    for i, move in enumerate(moves):
+        board.push(move)
+        masks.append(piece_masks(board))
+        if board.is_checkmate(): game_over_scores[i] = -99999 if board.turn == chess.WHITE else 99999
+        elif board.is_stalemate() or board.is_insufficient_material(): game_over_scores[i] = 0
+        board.pop()
+    scores = evaluate_masks(masks) if masks else np.zeros(0, dtype=np.int64)
+    for i, score in game_over_scores.items(): scores[i] = score
+    return moves, scores
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import chess
+from engine import PUZZLES, Searcher, TranspositionTable, evaluate_board, get_search_pool
+
+# --- Benchmark Positions ---
+BENCH_POSITIONS = [
+    ("start", chess.STARTING_FEN),
+    ("italian", "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"),
+    ("giuoco_middlegame", "r2q1rk1/ppp2ppp/2npbn2/2b1p3/2B1P3/2NP1N2/PPP2PPP/R1BQ1RK1 w - - 0 8"),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("kpk", "8/5k2/8/3K4/8/8/4P3/8 w - - 0 1"),
+    ("lucena", "1K1k4/1P6/8/8/8/8/r7/2R5 w - - 0 1"),
+] + [(f"puzzle_{i + 1}", puzzle["fen"]) for i, puzzle in enumerate(PUZZLES)]
+SLOWDOWN_TOLERANCE = 0.10 # Fraction of nodes/sec that may be lost against the baseline before it's flagged
+MIN_TIMED_SECONDS = 0.1 # Positions searched faster than this are too noisy to flag for speed on their own
+
+# --- Search Benchmark ---
+def run_search(depth, positions=BENCH_POSITIONS, repeats=3, eval_calls=2000):
+    # Same searcher get_best_move_ai uses, minus the opening book and cache so every position is really searched.
+    # Each measurement keeps the fastest of `repeats` runs; the search itself is deterministic
+    rows = []
+    for name, fen in positions:
+        seconds = float("inf")
+        for _ in range(repeats):
+            searcher, start = Searcher(TranspositionTable()), time.perf_counter()
+            move = searcher.search(chess.Board(fen), depth=depth)
+            if time.perf_counter() - start < seconds: seconds, stats = time.perf_counter() - start, searcher.stats
+        rows.append({
+            "name": name, "fen": fen, "best_move": move and move.uci(), "score": searcher.score, "nodes": searcher.nodes,
+            "seconds": seconds, "nps": searcher.nodes / seconds if seconds else 0.0, "depth_times": stats.depth_times,
+            "first_move_cutoff_rate": stats.first_move_cutoff_rate(), "tt_hit_rate": stats.tt_hit_rate(), "branching_factor": stats.branching_factor(),
+        })
+    boards, eval_seconds = [chess.Board(fen) for _, fen in positions], float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(eval_calls // len(boards)):
+            for board in boards: evaluate_board(board)
+        eval_seconds = min(eval_seconds, time.perf_counter() - start)
+    eval_total = eval_calls // len(boards) * len(boards)
+    nodes, seconds = sum(row["nodes"] for row in rows), sum(row["seconds"] for row in rows)
+    return {
+        "depth": depth, "positions": rows,
+        "total": {"nodes": nodes, "seconds": seconds, "nps": nodes / seconds if seconds else 0.0},
+        "evaluate_board": {"calls": eval_total, "seconds": eval_seconds, "per_second": eval_total / eval_seconds},
+    }
+
+def compare_to_baseline(report, baseline, tolerance=SLOWDOWN_TOLERANCE):
+    # Returns a list of human-readable regressions: changed best moves/node counts (the search is deterministic) and slowdowns
+    problems = []
+    if baseline["depth"] != report["depth"]: return [f"baseline was searched to depth {baseline['depth']}, not {report['depth']}"]
+    old_rows = {row["name"]: row for row in baseline["positions"]}
+    for row in report["positions"]:
+        old = old_rows.get(row["name"])
+        if old is None or old["fen"] != row["fen"]: continue
+        if old["best_move"] != row["best_move"]: problems.append(f"{row['name']}: best move {old['best_move']} -> {row['best_move']}")
+        if old["nodes"] != row["nodes"]: problems.append(f"{row['name']}: nodes {old['nodes']} -> {row['nodes']}")
+        if old["seconds"] >= MIN_TIMED_SECONDS and row["nps"] < old["nps"] * (1 - tolerance):
+            problems.append(f"{row['name']}: {old['nps']:.0f} -> {row['nps']:.0f} nodes/sec")
+    for key, label in (("total", "nps"), ("evaluate_board", "per_second")):
+        old, new = baseline[key][label], report[key][label]
+        if new < old * (1 - tolerance): problems.append(f"{key}: {old:.0f} -> {new:.0f} per second")
+    return problems
+
+def print_search(report):
+    print(f"{'position':<20} {'move':>6} {'score':>7} {'nodes':>9} {'seconds':>8} {'nps':>8}  time to depth")
+    for row in report["positions"]:
+        depth_times = " ".join(f"{seconds:.2f}" for seconds in row["depth_times"])
+        print(f"{row['name']:<20} {row['best_move'] or '-':>6} {row['score']:>7} {row['nodes']:>9} {row['seconds']:>8.2f} {row['nps']:>8.0f}  {depth_times}")
+    total, evals = report["total"], report["evaluate_board"]
+    print(f"{'total':<20} {'':>6} {'':>7} {total['nodes']:>9} {total['seconds']:>8.2f} {total['nps']:>8.0f}")
+    print(f"evaluate_board: {evals['per_second']:.0f} calls/sec")
+
+# --- Parallel Scaling ---
+def run_scaling(depth, worker_counts, positions=BENCH_POSITIONS):
+    # A serial run always comes first: it is the reference for both the results and the speedup
+    serial_results, rows = {}, []
+    for workers in [1] + [count for count in worker_counts if count != 1]:
+        if workers > 1: get_search_pool(workers) # Pool start-up is not part of the measurement
+        nodes, matches_serial, start = 0, True, time.perf_counter()
+        for name, fen in positions:
+            searcher = Searcher(TranspositionTable())
+            move = searcher.search(chess.Board(fen), depth=depth, workers=workers)
+            nodes += searcher.nodes
+            result = (move and move.uci(), searcher.score)
+            matches_serial = matches_serial and serial_results.setdefault(name, result) == result
+        rows.append({"workers": workers, "seconds": time.perf_counter() - start, "nodes": nodes, "matches_serial": matches_serial})
+    for row in rows: row["speedup"] = rows[0]["seconds"] / row["seconds"]
+    return rows
+
+def print_scaling(rows):
+    print(f"{'workers':>8} {'seconds':>9} {'nodes':>10} {'speedup':>8}  same result")
+    for row in rows:
+        print(f"{row['workers']:>8} {row['seconds']:>9.2f} {row['nodes']:>10} {row['speedup']:>7.2f}x  {'yes' if row['matches_serial'] else 'NO'}")
+
+# --- Startup Time ---
+STARTUP_STAGES = ("imports", "window", "game", "first_frame")
+
+def run_startup(repeats=5, headless=False):
+    # Fresh trainer processes timed to their first frame by main.py --startup-time, plus the whole process from the
+    # outside. The first run after an asset change also builds the sprite atlas and font cache
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    if headless: env["SDL_VIDEODRIVER"] = "dummy"
+    rows = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "main.py", "--startup-time"], cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True, check=True).stdout
+        row = json.loads(output.strip().splitlines()[-1])
+        row["process"] = time.perf_counter() - start
+        rows.append(row)
+    return rows
+
+def print_startup(rows):
+    print(f"{'run':>4} " + " ".join(f"{stage:>12}" for stage in STARTUP_STAGES + ("process",)))
+    for i, row in enumerate(rows, 1):
+        print(f"{i:>4} " + " ".join(f"{row[stage] * 1000:>10.0f}ms" for stage in STARTUP_STAGES + ("process",)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Chess engine benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    search = commands.add_parser("search", help="nodes, nodes/sec, time to depth and best move over the benchmark positions")
+    search.add_argument("--depth", type=int, default=4)
+    search.add_argument("--repeat", type=int, default=3, help="runs per measurement, the fastest is kept")
+    search.add_argument("--json", action="store_true", help="print machine-readable JSON instead of a table")
+    search.add_argument("--save-baseline", metavar="PATH", help="write the results to PATH for later comparison")
+    search.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline; exits with status 1 on any regression")
+    search.add_argument("--tolerance", type=float, default=SLOWDOWN_TOLERANCE, help="allowed nodes/sec loss against the baseline (default 0.10)")
+    scaling = commands.add_parser("scaling", help="speedup of the parallel root search at several worker counts")
+    scaling.add_argument("--depth", type=int, default=4)
+    scaling.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    scaling.add_argument("--json", action="store_true", help="print machine-readable JSON instead of a table")
+    startup = commands.add_parser("startup", help="time from launch to the trainer's first frame, in fresh processes")
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.add_argument("--headless", action="store_true", help="use SDL's dummy video driver, e.g. without a display")
+    startup.add_argument("--json", action="store_true", help="print machine-readable JSON instead of a table")
+    args = parser.parse_args()
+
+    if args.command == "search":
+        report = run_search(args.depth, repeats=args.repeat)
+        if args.json: print(json.dumps(report, indent=2))
+        else: print_search(report)
+        if args.save_baseline:
+            with open(args.save_baseline, "w") as f: json.dump(report, f, indent=2)
+        if args.baseline:
+            with open(args.baseline) as f: problems = compare_to_baseline(report, json.load(f), args.tolerance)
+            for problem in problems: print(f"REGRESSION {problem}", file=sys.stderr)
+            if problems: sys.exit(1)
+            print("no regressions against the baseline", file=sys.stderr)
+    elif args.command == "scaling":
+        rows = run_scaling(args.depth, args.workers)
+        if args.json: print(json.dumps(rows, indent=2))
+        else: print_scaling(rows)
+    elif args.command == "startup":
+        rows = run_startup(args.repeat, args.headless)
+        if args.json: print(json.dumps(rows, indent=2))
+        else: print_startup(rows)
+
+if __name__ == "__main__":
+    main()
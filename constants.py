@@ -1,10 +1,12 @@
-import pygame
+import os
 
 # --- Screen dimensions ---
 WIDTH, HEIGHT = 800, 640
 SIDEBAR_WIDTH = 240
 BOARD_SIZE = HEIGHT
 SQUARE_SIZE = BOARD_SIZE // 8
+FPS = 60
+IDLE_FPS = 15 # Frame rate while nothing is animating; only changed screen areas are repainted either way
 
 # --- Colors ---
 WHITE_SQUARE = (238, 238, 210)
@@ -19,8 +21,32 @@ BUTTON_COLOR = (80, 80, 80)
 BUTTON_HOVER_COLOR = (110, 110, 110)
 SUCCESS_COLOR = (124, 252, 0)
 
+# --- Engine ---
+DATA_DIR = os.path.dirname(os.path.abspath(__file__)) # Bundled data files sit next to the code, wherever the trainer is started from
+AI_THINK_TIME = 1.0 # Seconds the AI may spend on each of its moves
+TT_SIZE_MB = 16 # Memory cap of each transposition table: the engine's own, and one per side in match.py games
+OPENING_BOOK_PATH = os.path.join(DATA_DIR, "book.bin") # Optional Polyglot book; without it the AI uses its small built-in book
+OPENING_BOOK_MAX_PLY = 16
+TABLEBASE_PATH = os.path.join(DATA_DIR, "tablebases") # Endgame tables made by `python tablebase.py`; the engine plays those endings perfectly
+SYZYGY_PATH = None # e.g. "syzygy" for a directory of downloaded Syzygy .rtbw/.rtbz files
+PONDER = True # Search in the background on the player's turn, so hints and the AI's reply are ready sooner
+PONDER_TIME = 30 # Seconds of pondering on the AI's reply before the worker goes idle
+EVAL_BAR_DEPTH = 4 # Background search depth behind the eval bar; None shows the static evaluation only
+SEARCH_LOG_PATH = None # e.g. "search.log" to log statistics for every engine move
+SEARCH_PROFILE_PATH = None # e.g. "search.prof" to run engine moves under cProfile (view with python -m pstats)
+DEBUG_OVERLAY = False # Search statistics next to the sidebar; F3 toggles it in game
+
+# --- Puzzles ---
+PUZZLE_DB_PATH = os.path.join(DATA_DIR, "puzzles.csv") # Optional Lichess puzzle CSV; indexed on first use
+PUZZLE_MIN_RATING, PUZZLE_MAX_RATING = 0, 3500
+PUZZLE_THEME = None # e.g. "fork" or "mateIn2"; None allows any theme
+
+# --- Assets ---
+ASSET_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".chess_trainer") # Pre-scaled piece sprites and resolved font files
+THUMBNAIL_SIZE = 30 # Captured-piece icons
+
 # --- Fonts ---
-pygame.font.init()
-FONT_SMALL = pygame.font.SysFont('Arial', 18)
-FONT_MEDIUM = pygame.font.SysFont('Arial', 24)
-FONT_LARGE = pygame.font.SysFont('Arial', 32, bold=True)
\ No newline at end of file
+# (name, size, bold); game.get_font loads each on first use, so nothing here needs pygame
+FONT_SMALL = ('Arial', 18, False)
+FONT_MEDIUM = ('Arial', 24, False)
+FONT_LARGE = ('Arial', 32, True)
\ No newline at end of file
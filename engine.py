@@ -1,5 +1,12 @@
+import cProfile
 import chess
+import chess.polyglot
+import logging
+import multiprocessing
 import random
+import time
+from constants import TT_SIZE_MB
+from tablebase import open_tablebases
 
 # --- AI Logic ---
 piece_score = {
@@ -77,10 +84,50 @@ PUZZLES = [
 ]
 
 def get_opening_move(board):
+    # The dict is keyed by the moves played since the standard starting position, so other start positions never match
+    if board.root().board_fen() != chess.STARTING_BOARD_FEN: return None
     move_history = " ".join([move.uci() for move in board.move_stack])
     if move_history in opening_book: return chess.Move.from_uci(random.choice(opening_book[move_history]))
     return None
 
+# --- Polyglot Opening Book ---
+BOOK_MAX_PLY = 4 # Plies into the game the book is consulted for
+
+class OpeningBook:
+    # A Polyglot .bin book is memory-mapped by python-chess and binary-searched on the Zobrist key, so large
+    # books open instantly, cost next to no memory and recognise transpositions. Moves are picked weighted by
+    # book weight; positions the book doesn't have (or no book at all) fall back to the opening_book dict
+    def __init__(self, path=None, max_ply=BOOK_MAX_PLY):
+        self.reader = chess.polyglot.open_reader(path) if path else None
+        self.max_ply = max_ply
+
+    def get_move(self, board):
+        if board.ply() >= self.max_ply: return None
+        if self.reader:
+            try: return self.reader.weighted_choice(board).move
+            except IndexError: pass
+        return get_opening_move(board)
+
+    def close(self):
+        if self.reader: self.reader.close()
+
+book = OpeningBook()
+
+def load_opening_book(path=None, max_ply=BOOK_MAX_PLY):
+    global book
+    book.close()
+    book = OpeningBook(path, max_ply)
+    return book
+
+# --- Endgame Tablebases ---
+tablebases = None # tablebase.Tablebases once load_tablebases has found any tables; probed in the search and at the root
+
+def load_tablebases(path=None, syzygy_path=None):
+    global tablebases
+    if tablebases: tablebases.close()
+    tablebases = open_tablebases(path, syzygy_path)
+    return tablebases
+
 def evaluate_board(board):
     if board.is_checkmate(): return -99999 if board.turn == chess.WHITE else 99999
     if board.is_stalemate() or board.is_insufficient_material(): return 0
@@ -98,34 +145,535 @@ def evaluate_board(board):
             else: score -= (material_value + positional_value)
     return score
 
-def minimax(board, depth, alpha, beta, maximizing_player):
-    if depth == 0 or board.is_game_over(): return evaluate_board(board), None
-    best_move, legal_moves = None, list(board.legal_moves)
-    legal_moves.sort(key=lambda move: board.is_capture(move), reverse=True)
-    if maximizing_player:
-        max_eval = -float('inf')
-        for move in legal_moves:
-            board.push(move)
-            evaluation, _ = minimax(board, depth - 1, alpha, beta, False)
-            board.pop()
-            if evaluation > max_eval: max_eval, best_move = evaluation, move
-            alpha = max(alpha, evaluation)
-            if beta <= alpha: break
-        return max_eval, best_move
-    else:
-        min_eval = float('inf')
-        for move in legal_moves:
-            board.push(move)
-            evaluation, _ = minimax(board, depth - 1, alpha, beta, True)
-            board.pop()
-            if evaluation < min_eval: min_eval, best_move = evaluation, move
-            beta = min(beta, evaluation)
-            if beta <= alpha: break
-        return min_eval, best_move
-
-def get_best_move_ai(board, depth=3):
-    if len(board.move_stack) < 4:
-        move = get_opening_move(board)
-        if move and move in board.legal_moves: return move
-
-    return minimax(board, depth, -float('inf'), float('inf'), board.turn == chess.WHITE)[1]
+# --- Incremental Evaluation ---
+def _signed_square_values(table, piece_type, color):
+    sign = 1 if color == chess.WHITE else -1
+    return [sign * (piece_score[piece_type] + table[sq if color == chess.WHITE else chess.square_mirror(sq)]) for sq in chess.SQUARES]
+
+def _square_value_tables(position_scores):
+    return ({color: {pt: _signed_square_values(position_scores[pt], pt, color) for pt in range(chess.PAWN, chess.KING)} for color in chess.COLORS},
+            {color: [_signed_square_values(table, chess.KING, color) for table in position_scores[chess.KING]] for color in chess.COLORS})
+
+# SQUARE_VALUES[color][piece_type][square] is the signed material + positional term evaluate_board adds for that piece
+SQUARE_VALUES, KING_VALUES = _square_value_tables(piece_position_scores)
+# PIECE_KEYS[color][piece_type][square] is the Polyglot Zobrist number chess.polyglot.zobrist_hash mixes in for that piece
+PIECE_KEYS = {color: {pt: [chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * ((pt - 1) * 2 + int(color)) + sq] for sq in chess.SQUARES] for pt in chess.PIECE_TYPES} for color in chess.COLORS}
+_zobrist_hasher = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+
+# Alternative (SQUARE_VALUES, KING_VALUES) for the searcher to evaluate with, e.g. to measure a change in match.py
+EVAL_VARIANTS = {
+    "default": (SQUARE_VALUES, KING_VALUES),
+    "material": _square_value_tables({pt: [[0] * 64] * 2 if pt == chess.KING else [0] * 64 for pt in chess.PIECE_TYPES}),
+}
+
+def use_eval_variant(name):
+    # Every search from here on evaluates with these tables; evaluate_board and batch_eval keep the default ones
+    global SQUARE_VALUES, KING_VALUES
+    SQUARE_VALUES, KING_VALUES = EVAL_VARIANTS[name]
+
+class IncrementalEvaluator:
+    # Keeps the evaluate_board terms (and the piece part of the Zobrist key) up to date as moves are
+    # pushed and popped through it, so a leaf costs a couple of additions instead of a scan over all 64 squares
+    def __init__(self, board):
+        self.board = board
+        self.refresh()
+
+    def refresh(self):
+        self.score, self.king_scores, self.piece_count, self.piece_key, self.history = 0, [0, 0], 0, 0, []
+        for square, piece in self.board.piece_map().items():
+            self.piece_count += 1
+            self.piece_key ^= PIECE_KEYS[piece.color][piece.piece_type][square]
+            if piece.piece_type == chess.KING:
+                for phase in (0, 1): self.king_scores[phase] += KING_VALUES[piece.color][phase][square]
+            else: self.score += SQUARE_VALUES[piece.color][piece.piece_type][square]
+
+    def push(self, move):
+        board = self.board
+        self.history.append((self.score, self.king_scores[0], self.king_scores[1], self.piece_count, self.piece_key))
+        color, from_sq, to_sq = board.turn, move.from_square, move.to_square
+        piece_type = board.piece_type_at(from_sq)
+        keys = PIECE_KEYS[color]
+        if piece_type == chess.KING:
+            if board.is_castling(move):
+                rank, kingside = chess.square_rank(from_sq), to_sq > from_sq
+                rook_from = to_sq if board.piece_type_at(to_sq) == chess.ROOK else chess.square(7 if kingside else 0, rank)
+                to_sq, rook_to = chess.square(6 if kingside else 2, rank), chess.square(5 if kingside else 3, rank)
+                rook_values = SQUARE_VALUES[color][chess.ROOK]
+                self.score += rook_values[rook_to] - rook_values[rook_from]
+                self.piece_key ^= keys[chess.ROOK][rook_from] ^ keys[chess.ROOK][rook_to]
+            else: self._remove_captured(move, not color)
+            for phase in (0, 1):
+                king_values = KING_VALUES[color][phase]
+                self.king_scores[phase] += king_values[to_sq] - king_values[from_sq]
+        else:
+            self._remove_captured(move, not color)
+            values = SQUARE_VALUES[color]
+            self.score += values[move.promotion or piece_type][to_sq] - values[piece_type][from_sq]
+        self.piece_key ^= keys[piece_type][from_sq] ^ keys[move.promotion or piece_type][to_sq]
+        board.push(move)
+
+    def _remove_captured(self, move, captured_color):
+        board = self.board
+        if board.is_en_passant(move):
+            captured_sq, captured_type = move.to_square + (-8 if captured_color == chess.BLACK else 8), chess.PAWN
+        else:
+            captured_sq, captured_type = move.to_square, board.piece_type_at(move.to_square)
+        if captured_type:
+            self.score -= SQUARE_VALUES[captured_color][captured_type][captured_sq]
+            self.piece_key ^= PIECE_KEYS[captured_color][captured_type][captured_sq]
+            self.piece_count -= 1
+
+    def pop(self):
+        self.score, self.king_scores[0], self.king_scores[1], self.piece_count, self.piece_key = self.history.pop()
+        return self.board.pop()
+
+    def zobrist_key(self):
+        # Same value as chess.polyglot.zobrist_hash(board), only castling, en passant and turn are rehashed
+        board = self.board
+        return self.piece_key ^ _zobrist_hasher.hash_castling(board) ^ _zobrist_hasher.hash_ep_square(board) ^ _zobrist_hasher.hash_turn(board)
+
+    def evaluate(self):
+        board = self.board
+        if board.is_checkmate(): return -99999 if board.turn == chess.WHITE else 99999
+        if board.is_stalemate() or board.is_insufficient_material(): return 0
+        return self.static_score()
+
+    def static_score(self):
+        # evaluate() without the game-over checks, for callers that already know the position isn't terminal
+        return self.score + self.king_scores[1 if self.piece_count <= 7 else 0]
+
+def _mvv_lva(board, move):
+    # Most valuable victim first, cheapest attacker breaks ties
+    victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+    return victim * 10 - board.piece_type_at(move.from_square)
+
+# --- Transposition Table ---
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+TT_ENTRY_BYTES = 270 # Memory per slot of a full table (entry tuple, its key, score and Move), used to turn the memory cap into a slot count
+
+class TranspositionTable:
+    def __init__(self, size_mb=TT_SIZE_MB):
+        self.size = max(1, size_mb * 1024 * 1024 // TT_ENTRY_BYTES)
+        self.clear()
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.age = 0
+
+    def new_search(self):
+        self.age += 1
+
+    def probe(self, key):
+        entry = self.slots[key % self.size]
+        return entry if entry and entry[0] == key else None
+
+    def store(self, key, depth, score, flag, move):
+        index = key % self.size
+        old = self.slots[index]
+        # Entries left over from earlier searches are always replaced, current ones only by an equal or deeper search
+        if old is None or old[5] != self.age or depth >= old[1]:
+            self.slots[index] = (key, depth, score, flag, move, self.age)
+
+transposition_table = TranspositionTable()
+
+# --- Search Driver ---
+DEFAULT_DEPTH = 3
+MAX_SEARCH_DEPTH = 32
+INFINITE_SCORE = 1000000
+MATE_SCORE = 99999
+MATE_THRESHOLD = 90000
+ASPIRATION_WINDOW = 50 # Half-width of the first root window around the previous iteration's score
+DELTA_MARGIN = 200 # Quiescence skips captures that can't lift the score to alpha even with this much to spare
+LIMIT_CHECK_MASK = 255 # Clock, node budget and stop callback are checked once every 256 nodes
+CACHED_TIMED_DEPTH = 4 # A time/node-limited search only takes a cached answer at least this deep
+TABLEBASE_WIN_SCORE = 20000 # Syzygy wins come without a mate distance: above any evaluation, below the mate scores
+TABLEBASE_WIN_THRESHOLD = TABLEBASE_WIN_SCORE - 1000 # Scores from here up are Syzygy wins or mates, both counted from the root
+
+def _tablebase_score(wdl, plies, ply):
+    # Side to move's score for a tablebase result ply plies from the root; generated tables' mates count down like found ones
+    if not wdl: return 0
+    score = TABLEBASE_WIN_SCORE - ply if plies is None else MATE_SCORE - ply - plies
+    return score if wdl > 0 else -score
+
+def _score_to_tt(score, ply):
+    # Mates and Syzygy wins are scored by distance from the root, but stored by distance from the entry's own position,
+    # so a hit reached at another ply still counts its mate or tablebase win from there
+    if score >= TABLEBASE_WIN_THRESHOLD: return score + ply
+    if score <= -TABLEBASE_WIN_THRESHOLD: return score - ply
+    return score
+
+def _score_from_tt(score, ply):
+    if score >= TABLEBASE_WIN_THRESHOLD: return score - ply
+    if score <= -TABLEBASE_WIN_THRESHOLD: return score + ply
+    return score
+
+class SearchAborted(Exception):
+    pass
+
+# --- Search Statistics ---
+class SearchStats:
+    COUNTERS = ("nodes", "quiescence_nodes", "leaf_evals", "beta_cutoffs", "first_move_cutoffs", "tt_probes", "tt_hits", "tt_cutoffs", "tablebase_hits")
+
+    def __init__(self, source="search"):
+        self.source = source # "search", or "book"/"cache"/"tablebase" when the move came without searching
+        for name in self.COUNTERS: setattr(self, name, 0)
+        self.depth, self.score, self.seconds = 0, 0, 0.0
+        self.depth_times, self.depth_nodes = [], [] # Elapsed time and total nodes at each completed depth
+
+    def merge(self, other):
+        for name in self.COUNTERS: setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def first_move_cutoff_rate(self):
+        # Share of beta cutoffs caused by the first move tried, i.e. how good the move ordering is
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def branching_factor(self):
+        # Effective branching factor: how much the last iteration grew over the one before it
+        if len(self.depth_nodes) < 2: return 0.0
+        iteration_nodes = [nodes - previous for nodes, previous in zip(self.depth_nodes, [0] + self.depth_nodes)]
+        return iteration_nodes[-1] / iteration_nodes[-2] if iteration_nodes[-2] else 0.0
+
+    def nps(self):
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        stats = {name: getattr(self, name) for name in self.COUNTERS}
+        stats.update(source=self.source, depth=self.depth, score=self.score, seconds=self.seconds, nps=self.nps(), depth_times=self.depth_times,
+                     depth_nodes=self.depth_nodes, first_move_cutoff_rate=self.first_move_cutoff_rate(), tt_hit_rate=self.tt_hit_rate(), branching_factor=self.branching_factor())
+        return stats
+
+    def summary(self):
+        if self.source != "search": return f"{self.source} move"
+        return (f"depth {self.depth} score {self.score} nodes {self.nodes} ({self.quiescence_nodes} quiescence) {self.nps():.0f} nps {self.seconds:.2f}s "
+                f"evals {self.leaf_evals} cutoffs {self.beta_cutoffs} first-move {self.first_move_cutoff_rate():.0%} tt hits {self.tt_hit_rate():.0%} ebf {self.branching_factor():.1f}")
+
+class Searcher:
+    def __init__(self, tt=None):
+        self.tt = transposition_table if tt is None else tt
+        self.nodes, self.score, self.depth_reached, self.pv, self.stats = 0, 0, 0, [], SearchStats()
+
+    def search(self, board, depth=None, time_limit=None, node_limit=None, stop=None, workers=1):
+        # Iterative deepening up to depth (or until the time/node budget runs out or stop() returns True), returns the best move found.
+        # self.score is left from White's point of view, like evaluate_board
+        limited = time_limit is not None or node_limit is not None
+        if workers > 1 and depth and depth > 1 and not limited and stop is None: return self._parallel_search(board, depth, workers)
+        max_depth = depth or (MAX_SEARCH_DEPTH if limited else DEFAULT_DEPTH)
+        self._prepare(board, max_depth, time_limit, node_limit, stop)
+        best_move, score = None, 0
+        for iteration_depth in range(1, max_depth + 1):
+            self.root_best = None
+            try:
+                score, move = self._aspiration_search(board, iteration_depth, score)
+            except SearchAborted:
+                # The previous PV move is searched first, so a partial iteration's best is never worse than it
+                if self.root_best: best_move = self.root_best
+                break
+            if move is None: break # The root position itself is already over
+            best_move, self.depth_reached = move, iteration_depth
+            self.score = score if board.turn == chess.WHITE else -score
+            self.pv = self._extract_pv(board, move, iteration_depth)
+            self._record_depth()
+            if abs(score) >= MATE_THRESHOLD: break
+        self.stats.nodes, self.stats.seconds = self.nodes, time.perf_counter() - self.start_time # Includes any unfinished iteration
+        return best_move or next(iter(board.legal_moves), None)
+
+    def _record_depth(self):
+        stats = self.stats
+        stats.nodes, stats.depth, stats.score, stats.seconds = self.nodes, self.depth_reached, self.score, time.perf_counter() - self.start_time
+        stats.depth_times.append(stats.seconds); stats.depth_nodes.append(self.nodes)
+
+    def _prepare(self, board, max_depth, time_limit=None, node_limit=None, stop=None):
+        self.start_time = time.perf_counter()
+        self.deadline = self.start_time + time_limit if time_limit is not None else None
+        self.node_limit, self.stop = node_limit, stop
+        # Fixed-depth searches (and so the parallel root search, which has to match them) only take same-depth cutoffs,
+        # so their scores never depend on what earlier searches left in the table. Timed searches use any deeper entry too
+        self.exact_depth_cutoffs = time_limit is None and node_limit is None
+        self.nodes, self.score, self.depth_reached, self.pv, self.stats = 0, 0, 0, [], SearchStats()
+        self.killers = [[None, None] for _ in range(max_depth + 1)]
+        self.history_scores = {}
+        self.evaluator = IncrementalEvaluator(board)
+        self.tt.new_search()
+        # Hashes of the positions before the root back to the last capture or pawn move, extended along the search path
+        history_board, self.key_history = board.copy(), []
+        for _ in range(min(board.halfmove_clock, len(board.move_stack))):
+            history_board.pop(); self.key_history.append(chess.polyglot.zobrist_hash(history_board))
+        self.key_history.reverse()
+
+    def _aspiration_search(self, board, depth, previous_score):
+        # Root search in a narrow window around the previous score, widening whichever side fails
+        if depth < 3 or abs(previous_score) >= MATE_THRESHOLD: return self._negamax(board, depth, -INFINITE_SCORE, INFINITE_SCORE, 0, True)
+        window = ASPIRATION_WINDOW
+        alpha, beta = previous_score - window, previous_score + window
+        while True:
+            score, move = self._negamax(board, depth, alpha, beta, 0, True)
+            if alpha < score < beta: return score, move
+            window *= 4
+            if score <= alpha: alpha = max(score - window, -INFINITE_SCORE)
+            else: beta = min(score + window, INFINITE_SCORE)
+
+    def _parallel_search(self, board, depth, workers):
+        # Root splitting: the first iterations run here so the root moves come out in exactly the order
+        # the serial search would try them at the final depth. The first move gets a full window, the rest
+        # are scored in the pool against its score and the first best move in that order wins, like serial
+        self.search(board, depth - 1)
+        if not self.pv or abs(self.score) >= MATE_THRESHOLD: return self.pv[0] if self.pv else None
+        entry = self.tt.probe(chess.polyglot.zobrist_hash(board))
+        root_moves = self._order_moves(board, list(board.generate_legal_moves()), 0, self.pv[0], entry[4] if entry else None)
+        best_score, best_move = self._search_root_move(board, root_moves[0], depth, -INFINITE_SCORE, INFINITE_SCORE), root_moves[0]
+        tasks = [(board, move, depth, best_score, INFINITE_SCORE) for move in root_moves[1:]]
+        for move, (score, stats) in zip(root_moves[1:], get_search_pool(workers).map(_score_root_move, tasks, chunksize=1)):
+            self.nodes += stats.nodes
+            self.stats.merge(stats)
+            if score > best_score: best_score, best_move = score, move
+        self.score, self.depth_reached, self.pv = best_score if board.turn == chess.WHITE else -best_score, depth, [best_move]
+        self._record_depth()
+        return best_move
+
+    def score_moves(self, board, depth=DEFAULT_DEPTH, stop=None, moves=None):
+        # Multi-PV root search: every legal move scored for the side to move in one pass, best first, as [(move, score)].
+        # The best score is exact. The others only need their MOVE_LABELS bucket, so each is tested with null windows at the
+        # label thresholds below the best: its score is a bound that falls in the same bucket as the exact one would.
+        # Given moves, only those come back after the best one, each searched once more with a full window so its
+        # score is exact too. Returns [] if stop() interrupts it
+        try:
+            if depth > 1: self.search(board, depth - 1, stop=stop) # Move ordering and a warm table for the final pass
+            else: self._prepare(board, depth, stop=stop)
+            entry = self.tt.probe(chess.polyglot.zobrist_hash(board))
+            wanted = None if moves is None else set(moves)
+            moves = self._order_moves(board, list(board.generate_legal_moves()), 0, self.pv[0] if self.pv else None, entry[4] if entry else None)
+            # First the best move, as the root of a PVS search finds it; every other move is left with an upper bound
+            scores, best, best_score = [], None, -INFINITE_SCORE
+            for move in moves:
+                if not scores: score = self._search_root_move(board, move, depth, -INFINITE_SCORE, INFINITE_SCORE)
+                else:
+                    score = self._search_root_move(board, move, depth, best_score, best_score + 1)
+                    if score > best_score: score = self._search_root_move(board, move, depth, best_score, INFINITE_SCORE)
+                scores.append([move, score])
+                if score > best_score: best, best_score = scores[-1], score
+            # Then each bucket against the final best: a move at or above a threshold ends there, below it the next one is tried
+            if wanted is not None: scores = [item for item in scores if item is best or item[0] in wanted]
+            for item in scores:
+                if item is best: continue
+                if wanted is not None:
+                    item[1] = self._search_root_move(board, item[0], depth, -INFINITE_SCORE, INFINITE_SCORE)
+                    continue
+                for drop, _ in reversed(MOVE_LABELS):
+                    threshold = best_score + drop
+                    if item[1] < threshold: continue # The upper bound already rules this bucket out
+                    item[1] = self._search_root_move(board, item[0], depth, threshold - 1, threshold)
+                    if item[1] >= threshold: break
+        except SearchAborted: return []
+        scores = [tuple(item) for item in sorted(scores, key=lambda item: (item is best, item[1]), reverse=True)] # Best first whatever the bounds say
+        if scores:
+            self.score, self.depth_reached, self.pv = scores[0][1] if board.turn == chess.WHITE else -scores[0][1], depth, [scores[0][0]]
+            self._record_depth()
+        return scores
+
+    def _search_root_move(self, board, move, depth, alpha, beta):
+        self.key_history.append(chess.polyglot.zobrist_hash(board))
+        self.evaluator.push(move)
+        try: return -self._negamax(board, depth - 1, -beta, -alpha, 1, False)[0]
+        finally: self.evaluator.pop(); self.key_history.pop()
+
+    def _check_limits(self):
+        if self.node_limit is not None and self.nodes >= self.node_limit: raise SearchAborted()
+        if self.deadline is not None and time.perf_counter() >= self.deadline: raise SearchAborted()
+        if self.stop is not None and self.stop(): raise SearchAborted()
+
+    def _static_score(self, board):
+        self.stats.leaf_evals += 1
+        score = self.evaluator.static_score()
+        return score if board.turn == chess.WHITE else -score
+
+    def _is_fivefold_repetition(self, key, halfmove_clock):
+        # A repeat can only come after the last capture or pawn move, and five occurrences take at least 16 plies
+        if halfmove_clock < 16: return False
+        return self.key_history[max(0, len(self.key_history) - halfmove_clock):].count(key) >= 4
+
+    def _negamax(self, board, depth, alpha, beta, ply, on_pv):
+        # Fail-soft alpha-beta from the side to move's point of view. Only the first move gets the full
+        # window, the rest are tried with a null window and re-searched if they turn out to be better
+        if ply and tablebases and chess.popcount(board.occupied) <= tablebases.max_pieces:
+            result = tablebases.probe(board)
+            if result is not None: self.stats.tablebase_hits += 1; return _tablebase_score(*result, ply), None
+        if depth == 0: return self._quiescence(board, alpha, beta, ply), None
+        self.nodes += 1
+        if not self.nodes & LIMIT_CHECK_MASK: self._check_limits()
+        # Same outcomes as board.is_game_over(), but moves are generated once and reused for the search below.
+        # The 75-move and fivefold-repetition endings keep the static score, as evaluate_board gives them
+        moves = list(board.generate_legal_moves())
+        if not moves: return (-(MATE_SCORE - ply) if board.is_check() else 0), None # Nearer mates score higher
+        if board.is_insufficient_material(): return 0, None
+        key, tt_move = self.evaluator.zobrist_key(), None
+        if board.halfmove_clock >= 150 or self._is_fivefold_repetition(key, board.halfmove_clock): return self._static_score(board), None
+        entry, stats = self.tt.probe(key), self.stats
+        stats.tt_probes += 1
+        if entry:
+            stats.tt_hits += 1
+            _, tt_depth, tt_score, tt_flag, tt_move, _ = entry
+            tt_score = _score_from_tt(tt_score, ply)
+            if (tt_depth == depth if self.exact_depth_cutoffs else tt_depth >= depth) and not on_pv:
+                if tt_flag == EXACT: stats.tt_cutoffs += 1; return tt_score, tt_move
+                if tt_flag == LOWER_BOUND: alpha = max(alpha, tt_score)
+                else: beta = min(beta, tt_score)
+                if beta <= alpha: stats.tt_cutoffs += 1; return tt_score, tt_move
+        alpha_start, beta_start = alpha, beta
+        pv_move = self.pv[ply] if on_pv and ply < len(self.pv) else None
+        best_score, best_move = -INFINITE_SCORE, None
+        self.key_history.append(key)
+        for index, move in enumerate(self._order_moves(board, moves, ply, pv_move, tt_move)):
+            self.evaluator.push(move)
+            try:
+                if index == 0: score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1, move == pv_move)[0]
+                else:
+                    score = -self._negamax(board, depth - 1, -alpha - 1, -alpha, ply + 1, False)[0]
+                    if alpha < score < beta: score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1, False)[0]
+            finally: self.evaluator.pop()
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if ply == 0: self.root_best = move
+                    if alpha >= beta:
+                        stats.beta_cutoffs += 1
+                        if index == 0: stats.first_move_cutoffs += 1
+                        if not board.is_capture(move) and not move.promotion: self._record_quiet_cutoff(board, move, depth, ply)
+                        break
+        self.key_history.pop()
+        flag = UPPER_BOUND if best_score <= alpha_start else LOWER_BOUND if best_score >= beta_start else EXACT
+        self.tt.store(key, depth, _score_to_tt(best_score, ply), flag, best_move)
+        return best_score, best_move
+
+    def _quiescence(self, board, alpha, beta, ply):
+        # Past the horizon only captures are searched, so leaf scores never stop in the middle of an exchange
+        self.nodes += 1; self.stats.quiescence_nodes += 1
+        if not self.nodes & LIMIT_CHECK_MASK: self._check_limits()
+        # Checkmate and stalemate only need to know whether a first legal move exists
+        if not any(board.generate_legal_moves()): return -(MATE_SCORE - ply) if board.is_check() else 0
+        best_score = 0 if board.is_insufficient_material() else self._static_score(board)
+        if best_score >= beta: return best_score
+        alpha = max(alpha, best_score)
+        for move in sorted(board.generate_legal_captures(), key=lambda move: _mvv_lva(board, move), reverse=True):
+            victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+            if not move.promotion and best_score + piece_score[victim] + DELTA_MARGIN <= alpha: continue
+            # Taking a defended piece with a more valuable one loses material outright, so it can't beat standing pat
+            if piece_score[board.piece_type_at(move.from_square)] > piece_score[victim] and board.is_attacked_by(not board.turn, move.to_square): continue
+            self.evaluator.push(move)
+            try: score = -self._quiescence(board, -beta, -alpha, ply + 1)
+            finally: self.evaluator.pop()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta: break
+        return best_score
+
+    def _order_moves(self, board, moves, ply, pv_move, tt_move):
+        history_scores, turn = self.history_scores, board.turn
+        killer_first, killer_second = self.killers[ply]
+        priorities = {move: priority for move, priority in ((killer_second, 1000001), (killer_first, 1000002), (tt_move, 3000000), (pv_move, 4000000)) if move}
+        def move_order_key(move):
+            if move in priorities: return priorities[move]
+            if board.is_capture(move): return 2000000 + _mvv_lva(board, move)
+            if move.promotion: return 1500000 + move.promotion
+            return history_scores.get((turn, move.from_square, move.to_square), 0)
+        return sorted(moves, key=move_order_key, reverse=True)
+
+    def _record_quiet_cutoff(self, board, move, depth, ply):
+        killers = self.killers[ply]
+        if move != killers[0]: killers[0], killers[1] = move, killers[0]
+        history_key = (board.turn, move.from_square, move.to_square)
+        self.history_scores[history_key] = min(self.history_scores.get(history_key, 0) + depth * depth, 999999)
+
+    def _extract_pv(self, board, root_move, depth):
+        pv = [root_move]
+        board.push(root_move)
+        while len(pv) < depth:
+            entry = self.tt.probe(chess.polyglot.zobrist_hash(board))
+            if not entry or entry[4] is None or entry[4] not in board.legal_moves: break
+            pv.append(entry[4]); board.push(entry[4])
+        for _ in pv: board.pop()
+        return pv
+
+# --- Parallel Root Search ---
+_search_pools = {}
+
+def get_search_pool(workers):
+    if workers not in _search_pools: _search_pools[workers] = multiprocessing.Pool(workers)
+    return _search_pools[workers]
+
+def _score_root_move(task):
+    board, move, depth, alpha, beta = task
+    searcher = Searcher()
+    searcher._prepare(board, depth)
+    score = searcher._search_root_move(board, move, depth, alpha, beta)
+    searcher.stats.nodes = searcher.nodes
+    return score, searcher.stats
+
+# --- Move Selection ---
+log = logging.getLogger(__name__) # One line of search statistics per move at INFO level, once logging is configured
+_profiler = None
+
+def enable_profiling(path):
+    # Opt-in: every get_best_move_ai call from here on runs under cProfile, the cumulative stats are rewritten to path after each move
+    global _profiler
+    _profiler = (cProfile.Profile(), path)
+
+def get_best_move_ai(board, depth=None, time_limit=None, node_limit=None, tt=None, stop=None, workers=1, cache=None, return_stats=False):
+    # Returns the move, or (move, SearchStats) with return_stats
+    if _profiler:
+        profiler, path = _profiler
+        profiler.enable()
+        try: move, stats = _find_best_move(board, depth, time_limit, node_limit, tt, stop, workers, cache)
+        finally: profiler.disable(); profiler.dump_stats(path)
+    else: move, stats = _find_best_move(board, depth, time_limit, node_limit, tt, stop, workers, cache)
+    if log.isEnabledFor(logging.INFO): log.info("%s %s %s", board.fen(), move and move.uci(), stats.summary())
+    return (move, stats) if return_stats else move
+
+def _find_best_move(board, depth, time_limit, node_limit, tt, stop, workers, cache):
+    move = book.get_move(board)
+    if move and move in board.legal_moves: return move, SearchStats("book")
+    if tablebases:
+        result = tablebases.best_move(board)
+        if result:
+            move, wdl, plies = result
+            stats, score = SearchStats("tablebase"), _tablebase_score(wdl, plies, 0)
+            stats.score = score if board.turn == chess.WHITE else -score
+            return move, stats
+
+    # cache is anything with get(board, depth) -> move and put(board, depth, score, move), e.g. analysis_cache.AnalysisCache
+    limited = time_limit is not None or node_limit is not None
+    if cache is not None:
+        move = cache.get(board, depth or (CACHED_TIMED_DEPTH if limited else DEFAULT_DEPTH))
+        if move: return move, SearchStats("cache")
+    searcher = Searcher(tt)
+    move = searcher.search(board, depth, time_limit, node_limit, stop, workers)
+    if cache is not None and searcher.depth_reached:
+        # Iterative deepening stops at the first proven mate, which no deeper search changes, so it answers requests of any depth
+        cached_depth = MAX_SEARCH_DEPTH if abs(searcher.score) >= MATE_THRESHOLD else searcher.depth_reached
+        cache.put(board, cached_depth, searcher.score, searcher.pv[0])
+    return move, searcher.stats
+
+# --- Move Feedback ---
+HINT_DEPTH = 3
+GOOD_MOVE = "Good Move."
+MOVE_LABELS = [(-300, "Blunder!"), (-150, "Mistake."), (-75, "Inaccuracy.")] # Eval drop thresholds, worst first
+
+def analyze_move(board, move, depth=HINT_DEPTH, scores=None, tt=None, stop=None):
+    # Labels a move by how far below the best move it scores for the side making it, using one multi-PV search of the
+    # position before it (or the Searcher.score_moves result of one). Returns (label, eval_change, best_move), None if stopped.
+    # eval_change is exact when the search was given the move; from a search of every move it is only a bound in the label's range
+    if scores is None: scores = Searcher(tt).score_moves(board, depth, stop=stop, moves=[move])
+    if not scores: return None
+    best_move, best_score = scores[0]
+    eval_change = dict(scores)[move] - best_score
+    return _move_label(eval_change), eval_change, best_move
+
+def _move_label(eval_change):
+    for threshold, label in MOVE_LABELS:
+        if eval_change < threshold: return label
+    return GOOD_MOVE
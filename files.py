@@ -0,0 +1,12 @@
+import os
+
+# --- Atomic File Writes ---
+def replace_file(path, write):
+    # write(file) fills a temporary file beside path, which is then renamed over it, so readers see the old file or all of
+    # the new one. The process id keeps writers running at the same time (two trainers starting together) apart
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as temp_file: write(temp_file)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path): os.remove(temp_path)
@@ -1,33 +1,87 @@
 import pygame
 import chess
+import json
 import os
-import sys
+import zlib
 from collections import Counter
 from constants import *
-from engine import PUZZLES, get_best_move_ai, evaluate_board
+from engine import PUZZLES, GOOD_MOVE, HINT_DEPTH, analyze_move, evaluate_board
+from worker import SearchWorker
+from files import replace_file
+from puzzles import index_build_running, open_puzzle_store
 
 # --- Asset Loading ---
+PIECE_SYMBOLS = "PNBRQKpnbrqk"
+
+def _write_cache_file(path, data):
+    # The asset cache is an optimisation only: a location that can't be written just means rebuilding next launch
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        replace_file(path, lambda cache_file: cache_file.write(data))
+    except OSError: pass
+
 def load_piece_images():
-    pieces = {}
-    for filename in os.listdir('pieces'):
-        if filename.endswith('.png'):
-            piece_name = filename.strip('.png')
-            image = pygame.image.load(os.path.join('pieces', filename)).convert_alpha()
-            pieces[piece_name] = pygame.transform.scale(image, (SQUARE_SIZE, SQUARE_SIZE))
-    piece_map = {'P': pieces.get('wP'), 'R': pieces.get('wR'), 'N': pieces.get('wN'), 'B': pieces.get('wB'), 'K': pieces.get('wK'), 'Q': pieces.get('wQ'), 'p': pieces.get('bP'), 'r': pieces.get('bR'), 'n': pieces.get('bN'), 'b': pieces.get('bB'), 'k': pieces.get('bK'), 'q': pieces.get('bQ')}
-    return piece_map
+    # Sprites and captured-piece thumbnails pre-scaled for these sizes, cached as one raw RGBA atlas so later
+    # launches skip decoding and scaling the PNGs. Returns ({symbol: sprite}, {symbol: thumbnail})
+    paths = [os.path.join(DATA_DIR, 'pieces', ('w' if symbol.isupper() else 'b') + symbol.upper() + '.png') for symbol in PIECE_SYMBOLS]
+    stamp = zlib.crc32(repr([(os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in paths]).encode())
+    atlas_path = os.path.join(ASSET_CACHE_DIR, f"pieces-{SQUARE_SIZE}-{THUMBNAIL_SIZE}-{stamp:08x}.rgba")
+    sizes = [(SQUARE_SIZE, SQUARE_SIZE)] * len(paths) + [(THUMBNAIL_SIZE, THUMBNAIL_SIZE)] * len(paths)
+    try:
+        with open(atlas_path, 'rb') as atlas_file: atlas = atlas_file.read()
+        if len(atlas) != sum(4 * width * height for width, height in sizes): raise ValueError(atlas_path)
+        images, offset = [], 0
+        for width, height in sizes:
+            images.append(pygame.image.frombuffer(atlas[offset:offset + 4 * width * height], (width, height), 'RGBA').convert_alpha())
+            offset += 4 * width * height
+    except (OSError, ValueError):
+        images = [pygame.transform.scale(pygame.image.load(path).convert_alpha(), (SQUARE_SIZE, SQUARE_SIZE)) for path in paths]
+        images += [pygame.transform.scale(image, (THUMBNAIL_SIZE, THUMBNAIL_SIZE)) for image in images]
+        _write_cache_file(atlas_path, b"".join(pygame.image.tobytes(image, 'RGBA') for image in images))
+    return dict(zip(PIECE_SYMBOLS, images)), dict(zip(PIECE_SYMBOLS, images[len(paths):]))
+
+_fonts, _font_files = {}, None
+
+def get_font(spec):
+    # Fonts load on first use. pygame.font.SysFont scans every installed font on each launch, so the file it
+    # would pick for each (name, bold) is looked up once with the same rules and remembered in the asset cache
+    global _font_files
+    if spec in _fonts: return _fonts[spec]
+    name, size, bold = spec
+    cache_path, key = os.path.join(ASSET_CACHE_DIR, "fonts.json"), f"{name}/{'bold' if bold else 'regular'}"
+    if _font_files is None:
+        try:
+            with open(cache_path) as cache_file: _font_files = json.load(cache_file)
+        except (OSError, ValueError): _font_files = {}
+    if not pygame.font.get_init(): pygame.font.init()
+    font = None
+    if key in _font_files:
+        path, fake_bold = _font_files[key]
+        try: font = pygame.font.Font(path, size)
+        except (OSError, pygame.error): pass # Font since uninstalled: look it up again
+    if font is None:
+        path = pygame.font.match_font(name, bold)
+        fake_bold = bold and (path is None or path == pygame.font.match_font(name)) # No bold face, so SysFont would embolden
+        font = pygame.font.Font(path, size)
+        _font_files[key] = [path, fake_bold]
+        _write_cache_file(cache_path, json.dumps(_font_files).encode())
+    font.set_bold(fake_bold)
+    _fonts[spec] = font
+    return font
 
 # --- Game Class ---
 class Game:
     def __init__(self, screen):
         self.screen = screen
         self.board = chess.Board()
-        self.piece_images = load_piece_images()
+        self.piece_images, self.thumbnails = load_piece_images()
+        self.worker = SearchWorker(book_path=OPENING_BOOK_PATH, book_max_ply=OPENING_BOOK_MAX_PLY, tablebase_path=TABLEBASE_PATH, syzygy_path=SYZYGY_PATH, log_path=SEARCH_LOG_PATH, profile_path=SEARCH_PROFILE_PATH)
         self.mode = "play"
         self.game_over = False
         self.game_over_message = ""
         self.move_feedback = ""
         self.show_best_move = None
+        self.search_stats, self.debug_overlay = None, DEBUG_OVERLAY # Statistics of the AI's last move
         
         # UI State
         self.selected_square = None
@@ -42,7 +96,10 @@ class Game:
         self.anim_progress = 0
         
         # Puzzle State
-        self.puzzle_num = 0
+        self.puzzle_store = open_puzzle_store(PUZZLE_DB_PATH) # Falls back to the built-in puzzles without a database
+        self.puzzle_store_pending = self.puzzle_store is None and index_build_running(PUZZLE_DB_PATH) # Until its index is built
+        self.puzzle_num, self.puzzle = -1, None
+        self.next_puzzle()
         self.puzzle_step = 0
         self.puzzle_solved = False
         
@@ -55,17 +112,72 @@ class Game:
         self.restart_puzzle_button = pygame.Rect(BOARD_SIZE + 20, 220, 200, 50)
         self.solution_button = pygame.Rect(BOARD_SIZE + 20, 290, 200, 50)
 
-        if self.piece_images is None: sys.exit()
+        # Render Caches
+        self.board_surface = pygame.Surface((BOARD_SIZE, BOARD_SIZE))
+        for row in range(8):
+            for col in range(8):
+                color = WHITE_SQUARE if (row + col) % 2 == 0 else GREEN_SQUARE
+                pygame.draw.rect(self.board_surface, color, (col*SQUARE_SIZE, row*SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+        self.highlight_surfaces = {}
+        for color in (LAST_MOVE_COLOR, BEST_MOVE_COLOR):
+            self.highlight_surfaces[color] = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA); self.highlight_surfaces[color].fill(color)
+        self.overlay_surfaces = {}
+        for fill in ((40, 40, 40, 180), (0, 0, 0, 128)):
+            self.overlay_surfaces[fill] = pygame.Surface((BOARD_SIZE, HEIGHT), pygame.SRCALPHA); self.overlay_surfaces[fill].fill(fill)
+        self.text_cache = {}
+        self.sidebar_rect = pygame.Rect(BOARD_SIZE, 0, screen.get_width() - BOARD_SIZE, HEIGHT)
+        self.status_rect = pygame.Rect(BOARD_SIZE, 85, SIDEBAR_WIDTH, 60)
+        self.captured_rect = pygame.Rect(BOARD_SIZE, 290, screen.get_width() - BOARD_SIZE, 128)
+        self.eval_bar_rect = pygame.Rect(BOARD_SIZE + 70, HEIGHT - 220, 100, 200)
+        self.debug_rect = pygame.Rect(BOARD_SIZE + SIDEBAR_WIDTH, 20, screen.get_width() - BOARD_SIZE - SIDEBAR_WIDTH, 264)
+        self.full_redraw = True
+
+        # Position State, derived from self.board and refreshed by position_changed
+        self.position_version = 0
+        self.position_changed()
 
     def reset_game(self):
+        self.worker.cancel()
+        self.worker.clear_table() # Search results only carry over between moves of the same game
         self.board = chess.Board()
         self.game_over, self.move_feedback, self.last_move, self.show_best_move = False, "", None, None
         self.clear_selection()
+        self.position_changed()
     
+    def next_puzzle(self):
+        if self.puzzle_store_pending:
+            # Checked before opening, so a build finishing in between is still picked up on the next call
+            self.puzzle_store_pending = index_build_running(PUZZLE_DB_PATH)
+            self.puzzle_store = open_puzzle_store(PUZZLE_DB_PATH)
+            if self.puzzle_store: self.puzzle_num = -1 # Counted the built-in puzzles until now, so the store starts at its first match
+            self.puzzle_store_pending = self.puzzle_store is None and self.puzzle_store_pending
+        if self.puzzle_store:
+            found = self.puzzle_store.next_puzzle(PUZZLE_MIN_RATING, PUZZLE_MAX_RATING, PUZZLE_THEME, after=self.puzzle_num)
+            found = found or self.puzzle_store.next_puzzle(PUZZLE_MIN_RATING, PUZZLE_MAX_RATING, PUZZLE_THEME) # Wrap around
+            if found: self.puzzle_num, self.puzzle = found; return
+            self.puzzle_store.close(); self.puzzle_store, self.puzzle_num = None, -1 # Nothing matches the filter
+        self.puzzle_num = (self.puzzle_num + 1) % len(PUZZLES)
+        self.puzzle = PUZZLES[self.puzzle_num]
+
     def load_puzzle(self):
-        self.board = chess.Board(PUZZLES[self.puzzle_num]["fen"])
+        self.worker.cancel()
+        self.board = chess.Board(self.puzzle["fen"])
         self.puzzle_step, self.puzzle_solved, self.last_move, self.move_feedback = 0, False, None, ""
         self.clear_selection()
+        self.position_changed()
+
+    def position_changed(self):
+        # Every change to self.board ends here: sidebar state derived from the position is computed once per change
+        self.position_version += 1
+        self.eval_score = evaluate_board(self.board)
+        self.captured = self.captured_pieces()
+        self.pondered = None # Searched scores of every move in this position, once the ponder search has them
+        self.outcome = self.board.outcome() # None while the game goes on; update reads this instead of checking every frame
+        if self.outcome: return
+        if PONDER and self.mode == "play" and self.board.turn == chess.WHITE:
+            self.worker.ponder(("ponder", self.position_version), self.board, reply_time_limit=PONDER_TIME, eval_depth=EVAL_BAR_DEPTH, depth=HINT_DEPTH)
+        elif EVAL_BAR_DEPTH and self.mode == "play" and self.board.turn == chess.WHITE: # Never competes with the AI's own search, nor searches puzzles
+            self.worker.evaluate(("eval", self.position_version), self.board, depth=EVAL_BAR_DEPTH)
     
     def run(self):
         clock = pygame.time.Clock()
@@ -73,14 +185,19 @@ class Game:
         while running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT: running = False
+                if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED): self.full_redraw = True
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3: self.debug_overlay = not self.debug_overlay
                 if not self.animating and event.type == pygame.MOUSEBUTTONDOWN:
                     self.handle_click(event.pos)
             
-            if self.mode == "play" and self.board.turn == chess.BLACK and not self.game_over and not self.animating:
+            self.handle_search_results()
+            if self.mode == "play" and self.board.turn == chess.BLACK and not self.game_over and not self.animating and not self.worker.is_busy("ai_move"):
                 self.make_ai_move()
 
             self.update()
-            clock.tick(60)
+            clock.tick(FPS if self.animating else IDLE_FPS)
+        self.worker.close()
+        if self.puzzle_store: self.puzzle_store.close()
         pygame.quit()
 
     def start_animation(self, move, is_return=False):
@@ -92,22 +209,23 @@ class Game:
         self.anim_progress = 0
 
     def update(self):
-        self.draw_all()
+        dirty_rects = self.draw_all()
         if self.animating:
             self.anim_progress += 0.1
             if self.anim_progress >= 1:
                 self.animating, self.is_return_anim = False, False
                 self.anim_progress = 1
-        if self.mode == "play" and not self.game_over and self.board.is_game_over():
+        if self.mode == "play" and not self.game_over and self.outcome:
             self.game_over = True
-            self.game_over_message = f"Checkmate! {'Black' if self.board.turn == chess.WHITE else 'White'} wins." if self.board.is_checkmate() else "Game Over: Draw"
-        pygame.display.flip()
+            self.game_over_message = f"Checkmate! {'White' if self.outcome.winner == chess.WHITE else 'Black'} wins." if self.outcome.termination == chess.Termination.CHECKMATE else "Game Over: Draw"
+        if dirty_rects: pygame.display.update(dirty_rects)
 
     def make_move(self, move, is_player=False):
         if is_player: self.analyze_player_move(move)
         self.start_animation(move)
         self.last_move = move
         self.board.push(move)
+        self.position_changed()
 
     def handle_click(self, pos):
         if self.play_mode_button.collidepoint(pos): self.mode = "play"; self.reset_game(); return
@@ -116,11 +234,11 @@ class Game:
             if self.new_game_button.collidepoint(pos): self.reset_game()
             elif self.take_back_button.collidepoint(pos): self.take_back()
         elif self.mode == "puzzle":
-            if self.next_puzzle_button.collidepoint(pos): self.puzzle_num=(self.puzzle_num+1)%len(PUZZLES);self.load_puzzle()
+            if self.next_puzzle_button.collidepoint(pos): self.next_puzzle(); self.load_puzzle()
             elif self.restart_puzzle_button.collidepoint(pos): self.load_puzzle()
             elif self.solution_button.collidepoint(pos): self.show_solution()
         
-        if pos[0] <= BOARD_SIZE: self.handle_board_click(pos)
+        if pos[0] <= BOARD_SIZE and not (self.mode == "play" and self.board.turn == chess.BLACK): self.handle_board_click(pos)
 
     def handle_board_click(self, pos):
         col, row = pos[0] // SQUARE_SIZE, pos[1] // SQUARE_SIZE
@@ -171,24 +289,27 @@ class Game:
         self.selected_square, self.player_clicks, self.legal_moves_for_selected = None, [], []
 
     def check_puzzle_move(self, move_uci):
-        solution_move_uci = PUZZLES[self.puzzle_num]["solution"][self.puzzle_step]
+        solution_move_uci = self.puzzle["solution"][self.puzzle_step]
+        # There is no promotion picker and clicks always promote to a queen, so an under-promotion takes the solution's piece
+        if move_uci[:4] == solution_move_uci[:4] and len(solution_move_uci) == 5: move_uci = solution_move_uci
         if move_uci == solution_move_uci:
             move = chess.Move.from_uci(move_uci)
             self.start_animation(move)
             self.board.push(move)
             self.last_move = move
             self.puzzle_step += 1
-            if self.puzzle_step >= len(PUZZLES[self.puzzle_num]["solution"]):
+            if self.puzzle_step >= len(self.puzzle["solution"]):
                 self.puzzle_solved = True
             else: # Auto-play the next move in the solution
                 pygame.time.wait(300)
-                next_move = chess.Move.from_uci(PUZZLES[self.puzzle_num]["solution"][self.puzzle_step])
+                next_move = chess.Move.from_uci(self.puzzle["solution"][self.puzzle_step])
                 self.start_animation(next_move)
                 self.board.push(next_move)
                 self.last_move = self.board.peek()
                 self.puzzle_step += 1
-                if self.puzzle_step >= len(PUZZLES[self.puzzle_num]["solution"]):
+                if self.puzzle_step >= len(self.puzzle["solution"]):
                     self.puzzle_solved = True
+            self.position_changed()
         else:
             self.move_feedback = "Incorrect!"
             # Animate the piece back
@@ -196,92 +317,164 @@ class Game:
             self.start_animation(chess.Move.from_uci(move_uci[2:4]+move_uci[0:2]), is_return=True)
 
     def analyze_player_move(self, move):
-        eval_before = evaluate_board(self.board)
-        self.board.push(move)
-        eval_after = -evaluate_board(self.board)
-        self.board.pop()
-        eval_change = eval_after - eval_before
-        
-        if eval_change < -75:
-            self.show_best_move = get_best_move_ai(self.board, depth=3)
-        else:
-            self.show_best_move = None
+        # Label and "Best was:" hint come from one multi-PV search: usually the ponder's, finished while the player was thinking
+        self.move_feedback, self.show_best_move = "", None
+        if self.pondered: self.show_analysis(analyze_move(self.board, move, scores=self.pondered))
+        else: self.worker.analyze("analysis", self.board, move, HINT_DEPTH)
 
-        if eval_change < -300: self.move_feedback = "Blunder!"
-        elif eval_change < -150: self.move_feedback = "Mistake."
-        elif eval_change < -75: self.move_feedback = "Inaccuracy."
-        else: self.move_feedback = "Good Move."
+    def show_analysis(self, analysis):
+        label, _, best_move = analysis
+        self.move_feedback, self.show_best_move = label, best_move if label != GOOD_MOVE else None
 
     def make_ai_move(self):
-        ai_move = get_best_move_ai(self.board, depth=3)
-        if ai_move: self.make_move(ai_move)
+        self.worker.submit("ai_move", self.board, time_limit=AI_THINK_TIME)
+
+    def handle_search_results(self):
+        for purpose, result, stats in self.worker.poll():
+            if purpose == "analysis" and result is not None: self.show_analysis(result)
+            elif purpose == "ai_move" and result in self.board.legal_moves: self.search_stats = stats; self.make_move(result)
+            elif purpose == ("eval", self.position_version) and result is not None: self.eval_score = result
+            elif purpose == ("ponder", self.position_version) and result is not None:
+                self.pondered = result[0]
+                if EVAL_BAR_DEPTH: self.eval_score = result[1]
 
     def take_back(self):
-        if len(self.board.move_stack) >= 2:
-            self.board.pop(); self.board.pop()
+        # Back to the player's last turn: while the AI is still answering only the player's own move is undone
+        plies = 1 if self.board.turn == chess.BLACK else 2
+        if len(self.board.move_stack) >= plies:
+            self.worker.cancel()
+            for _ in range(plies): self.board.pop()
             self.game_over, self.move_feedback, self.last_move, self.show_best_move = False, "", None, None
             self.clear_selection()
+            self.position_changed()
 
     def show_solution(self):
         self.load_puzzle()
-        for move_uci in PUZZLES[self.puzzle_num]["solution"]:
+        for move_uci in self.puzzle["solution"]:
             self.board.push_uci(move_uci)
         self.last_move = self.board.peek(); self.puzzle_solved = True
+        self.position_changed()
 
+    # --- Drawing ---
+    # Each frame only repaints what changed: board squares are keyed on their contents and sidebar widgets on what they show
     def draw_all(self):
-        self.screen.fill(SIDEBAR_BG)
+        self.dirty_rects = []
+        if self.full_redraw:
+            self.screen.fill(SIDEBAR_BG)
+            self.drawn_squares, self.drawn_overlays, self.drawn_anim_rect, self.drawn_widgets = [None] * 64, None, None, {}
+            self.dirty_rects.append(self.screen.get_rect())
+            self.full_redraw = False
         self.draw_board_and_pieces()
         self.draw_sidebar()
-        if self.game_over: self.draw_game_over()
-        
+        return self.dirty_rects
+
+    def square_rect(self, square):
+        return pygame.Rect(chess.square_file(square) * SQUARE_SIZE, (7 - chess.square_rank(square)) * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+
+    def squares_under(self, rect):
+        cols = range(max(rect.left // SQUARE_SIZE, 0), min((rect.right - 1) // SQUARE_SIZE, 7) + 1)
+        rows = range(max(rect.top // SQUARE_SIZE, 0), min((rect.bottom - 1) // SQUARE_SIZE, 7) + 1)
+        return [chess.square(col, 7 - row) for col in cols for row in rows]
+
+    def render_text(self, font, text, color):
+        key = (font, text, color)
+        if key not in self.text_cache:
+            if len(self.text_cache) > 256: self.text_cache.clear()
+            self.text_cache[key] = get_font(font).render(text, True, color)
+        return self.text_cache[key]
+
     def draw_board_and_pieces(self):
-        for row in range(8):
-            for col in range(8):
-                color = WHITE_SQUARE if (row + col) % 2 == 0 else GREEN_SQUARE
-                pygame.draw.rect(self.screen, color, (col*SQUARE_SIZE, row*SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
-        if self.last_move:
-            self.highlight_square(self.last_move.from_square, LAST_MOVE_COLOR); self.highlight_square(self.last_move.to_square, LAST_MOVE_COLOR)
-        if self.show_best_move:
-            self.highlight_square(self.show_best_move.from_square, BEST_MOVE_COLOR); self.highlight_square(self.show_best_move.to_square, BEST_MOVE_COLOR)
-        
-        for square in self.legal_moves_for_selected:
-            x = chess.square_file(square) * SQUARE_SIZE + SQUARE_SIZE // 2
-            y = (7 - chess.square_rank(square)) * SQUARE_SIZE + SQUARE_SIZE // 2
-            pygame.draw.circle(self.screen, LEGAL_MOVE_COLOR, (x, y), 15)
-            
-        for sq in chess.SQUARES:
-            pc = self.board.piece_at(sq)
-            is_anim_piece = self.animating and sq == chess.square(int(self.anim_start_pos[0]/SQUARE_SIZE), 7-int(self.anim_start_pos[1]/SQUARE_SIZE))
-            if pc and not (is_anim_piece and not self.is_return_anim):
-                self.screen.blit(self.piece_images[pc.symbol()], (chess.square_file(sq)*SQUARE_SIZE, (7-chess.square_rank(sq))*SQUARE_SIZE))
-        
+        highlights = [()] * 64
+        for move, color in ((self.last_move, LAST_MOVE_COLOR), (self.show_best_move, BEST_MOVE_COLOR)):
+            if move: highlights[move.from_square] += (color,); highlights[move.to_square] += (color,)
+        anim_rect, hidden_square = None, None
         if self.animating:
             start_pos, end_pos = (self.anim_start_pos, self.anim_end_pos) if not self.is_return_anim else (self.anim_end_pos, self.anim_start_pos)
             x = start_pos[0] * (1-self.anim_progress) + end_pos[0] * self.anim_progress
             y = start_pos[1] * (1-self.anim_progress) + end_pos[1] * self.anim_progress
-            self.screen.blit(self.piece_images[self.anim_piece.symbol()], (x, y))
+            anim_rect = pygame.Rect(int(x), int(y), SQUARE_SIZE, SQUARE_SIZE)
+            if not self.is_return_anim: hidden_square = chess.square(int(self.anim_start_pos[0]/SQUARE_SIZE), 7-int(self.anim_start_pos[1]/SQUARE_SIZE))
+        dots = set(self.legal_moves_for_selected)
+        keys = []
+        for sq in chess.SQUARES:
+            pc = self.board.piece_at(sq)
+            keys.append((pc.symbol() if pc and sq != hidden_square else None, highlights[sq], sq in dots))
+        dirty = {sq for sq in chess.SQUARES if keys[sq] != self.drawn_squares[sq]}
+        for rect in (self.drawn_anim_rect, anim_rect):
+            if rect: dirty.update(self.squares_under(rect))
+        overlays = self.board_overlays()
+        if overlays != self.drawn_overlays or (overlays and dirty): dirty = set(chess.SQUARES) # Overlays cover the whole board
+
+        for sq in dirty:
+            symbol, colors, dot = keys[sq]
+            rect = self.square_rect(sq)
+            self.screen.blit(self.board_surface, rect, rect)
+            for color in colors: self.screen.blit(self.highlight_surfaces[color], rect)
+            if dot: pygame.draw.circle(self.screen, LEGAL_MOVE_COLOR, rect.center, 15)
+            if symbol: self.screen.blit(self.piece_images[symbol], rect)
+            self.dirty_rects.append(rect)
+        if anim_rect: self.screen.blit(self.piece_images[self.anim_piece.symbol()], anim_rect)
+        if dirty:
+            for text, color, fill in overlays:
+                self.screen.blit(self.overlay_surfaces[fill], (0, 0))
+                text_surf = self.render_text(FONT_LARGE, text, color)
+                self.screen.blit(text_surf, text_surf.get_rect(center=(BOARD_SIZE / 2, HEIGHT / 2)))
+        self.drawn_squares, self.drawn_overlays, self.drawn_anim_rect = keys, overlays, anim_rect
 
-    def highlight_square(self, square, color):
-        s = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
-        s.fill(color)
-        self.screen.blit(s, (chess.square_file(square) * SQUARE_SIZE, (7-chess.square_rank(square)) * SQUARE_SIZE))
+    def board_overlays(self):
+        overlays = ()
+        if self.mode == "puzzle" and (self.puzzle_solved or self.move_feedback == "Incorrect!"):
+            feedback = "Correct!" if self.puzzle_solved else self.move_feedback
+            color = SUCCESS_COLOR if self.puzzle_solved else (255, 69, 0) # Reddish-orange for incorrect
+            overlays += ((feedback, color, (0, 0, 0, 128)),)
+            if not self.puzzle_solved: self.move_feedback = "" # Reset after showing
+        if self.game_over: overlays += ((self.game_over_message, (255, 255, 255), (40, 40, 40, 180)),)
+        return overlays
+
+    def draw_widget(self, name, rect, key, draw):
+        if self.drawn_widgets.get(name) == key: return
+        self.screen.fill(SIDEBAR_BG, rect)
+        draw()
+        self.drawn_widgets[name] = key
+        self.dirty_rects.append(rect)
+
+    def draw_lines(self, lines):
+        for font, text, color, y in lines:
+            text_surf = self.render_text(font, text, color)
+            self.screen.blit(text_surf, text_surf.get_rect(center=(BOARD_SIZE + SIDEBAR_WIDTH // 2, y)))
 
     def draw_sidebar(self):
+        if self.drawn_widgets.get("mode") != self.mode: # Switching modes swaps the whole layout
+            self.screen.fill(SIDEBAR_BG, self.sidebar_rect)
+            self.drawn_widgets = {"mode": self.mode}
+            self.dirty_rects.append(self.sidebar_rect)
         self.draw_button(self.play_mode_button, "Play AI", self.mode == "play")
         self.draw_button(self.puzzle_mode_button, "Puzzles", self.mode == "puzzle")
         if self.mode == "play": self.draw_play_mode_sidebar()
         else: self.draw_puzzle_mode_sidebar()
+        self.draw_debug_overlay()
+
+    def draw_debug_overlay(self):
+        stats = self.search_stats if self.debug_overlay else None
+        if stats is None or stats.source != "search": lines = [stats.source + " move"] if stats else []
+        else:
+            lines = [f"depth {stats.depth}", f"score {stats.score}", f"nodes {stats.nodes}", f"qnodes {stats.quiescence_nodes}", f"evals {stats.leaf_evals}",
+                     f"{stats.nps():.0f} nps", f"time {stats.seconds:.2f}s", f"cutoffs {stats.beta_cutoffs}", f"first {stats.first_move_cutoff_rate():.0%}",
+                     f"tt hits {stats.tt_hit_rate():.0%}", f"ebf {stats.branching_factor():.1f}"]
+        self.draw_widget("debug", self.debug_rect, (self.debug_overlay, tuple(lines)), lambda: self.paint_debug_overlay(lines))
+
+    def paint_debug_overlay(self, lines):
+        for i, line in enumerate(lines):
+            self.screen.blit(self.render_text(FONT_SMALL, line, TEXT_COLOR), (self.debug_rect.x + 10, self.debug_rect.y + i * 24))
 
     def draw_play_mode_sidebar(self):
         if self.board.turn == chess.WHITE and self.move_feedback:
-            feedback_text = FONT_MEDIUM.render(self.move_feedback, True, TEXT_COLOR)
-            self.screen.blit(feedback_text, feedback_text.get_rect(center=(BOARD_SIZE + SIDEBAR_WIDTH // 2, 105)))
-            if self.show_best_move:
-                best_move_text = FONT_SMALL.render(f"Best was: {self.show_best_move.uci()}", True, BEST_MOVE_COLOR)
-                self.screen.blit(best_move_text, best_move_text.get_rect(center=(BOARD_SIZE + SIDEBAR_WIDTH // 2, 130)))
+            lines = ((FONT_MEDIUM, self.move_feedback, TEXT_COLOR, 105),)
+            if self.show_best_move: lines += ((FONT_SMALL, f"Best was: {self.show_best_move.uci()}", BEST_MOVE_COLOR, 130),)
         else:
-            turn_text = FONT_MEDIUM.render("Black's Turn", True, TEXT_COLOR)
-            self.screen.blit(turn_text, turn_text.get_rect(center=(BOARD_SIZE + SIDEBAR_WIDTH // 2, 105)))
+            turn_label = "Thinking" + "." * (pygame.time.get_ticks() // 400 % 4) if self.worker.is_busy("ai_move") else "Black's Turn"
+            lines = ((FONT_MEDIUM, turn_label, TEXT_COLOR, 105),)
+        self.draw_widget("status", self.status_rect, lines, lambda: self.draw_lines(lines))
         
         self.draw_button(self.new_game_button, "New Game")
         self.draw_button(self.take_back_button, "Take Back")
@@ -289,38 +482,34 @@ class Game:
         self.draw_eval_bar()
 
     def draw_puzzle_mode_sidebar(self):
-        goal_text = FONT_MEDIUM.render(PUZZLES[self.puzzle_num]["goal"], True, TEXT_COLOR)
-        self.screen.blit(goal_text, goal_text.get_rect(center=(BOARD_SIZE + SIDEBAR_WIDTH // 2, 105)))
+        goal = self.puzzle["goal"]
+        font = FONT_MEDIUM if get_font(FONT_MEDIUM).size(goal)[0] <= SIDEBAR_WIDTH else FONT_SMALL # Database goals can run long
+        lines = ((font, goal, TEXT_COLOR, 105),)
+        self.draw_widget("status", self.status_rect, lines, lambda: self.draw_lines(lines))
         self.draw_button(self.next_puzzle_button, "Next Puzzle")
         self.draw_button(self.restart_puzzle_button, "Restart Puzzle")
         self.draw_button(self.solution_button, "Show Solution")
-        if self.puzzle_solved or self.move_feedback == "Incorrect!":
-            feedback = "Correct!" if self.puzzle_solved else self.move_feedback
-            color = SUCCESS_COLOR if self.puzzle_solved else (255, 69, 0) # Reddish-orange for incorrect
-            self.draw_feedback_overlay(feedback, color)
-            if not self.puzzle_solved: self.move_feedback = "" # Reset after showing
 
     def draw_button(self, rect, text, is_active=False):
-        mouse_pos = pygame.mouse.get_pos()
-        color = BUTTON_HOVER_COLOR if rect.collidepoint(mouse_pos) else BUTTON_COLOR
+        hovered = rect.collidepoint(pygame.mouse.get_pos())
+        self.draw_widget(text, rect, (is_active, hovered), lambda: self.paint_button(rect, text, is_active, hovered))
+
+    def paint_button(self, rect, text, is_active, hovered):
+        color = BUTTON_HOVER_COLOR if hovered else BUTTON_COLOR
         if is_active: color = GREEN_SQUARE
         pygame.draw.rect(self.screen, color, rect, border_radius=8)
-        text_surf = FONT_MEDIUM.render(text, True, TEXT_COLOR)
+        text_surf = self.render_text(FONT_MEDIUM, text, TEXT_COLOR)
         self.screen.blit(text_surf, text_surf.get_rect(center=rect.center))
        
     def draw_eval_bar(self):
-        score = evaluate_board(self.board)
-        clamped_score = max(min(score, 1000), -1000)
+        clamped_score = max(min(self.eval_score, 1000), -1000)
         normalized_score = (clamped_score + 1000) / 2000
-        
-        bar_height = 200
-        bar_margin_bottom = 20
-        bar_y_start = HEIGHT - bar_height - bar_margin_bottom
-        
-        bar_rect = pygame.Rect(BOARD_SIZE + 70, bar_y_start, 100, bar_height)
-        
-        white_height = bar_height * normalized_score
-        black_height = bar_height - white_height
+        white_height = self.eval_bar_rect.height * normalized_score
+        self.draw_widget("eval_bar", self.eval_bar_rect, white_height, lambda: self.paint_eval_bar(white_height))
+
+    def paint_eval_bar(self, white_height):
+        bar_rect = self.eval_bar_rect
+        black_height = bar_rect.height - white_height
         
         white_rect = pygame.Rect(bar_rect.x, bar_rect.y + black_height, bar_rect.width, white_height)
         black_rect = pygame.Rect(bar_rect.x, bar_rect.y, bar_rect.width, black_height)
@@ -330,6 +519,9 @@ class Game:
         pygame.draw.rect(self.screen, TEXT_COLOR, bar_rect, 2, border_radius=5)
 
     def draw_captured_pieces(self):
+        self.draw_widget("captured", self.captured_rect, self.captured, lambda: self.paint_captured_pieces(*self.captured))
+
+    def captured_pieces(self):
         STARTING_PIECES = {'P':8,'R':2,'N':2,'B':2,'Q':1,'p':8,'r':2,'n':2,'b':2,'q':1}
         board_counts = Counter(p.symbol() for p in self.board.piece_map().values())
         captured_by_white, captured_by_black = [], []
@@ -338,28 +530,13 @@ class Game:
             if captured_count > 0:
                 for _ in range(captured_count): (captured_by_white if symbol.islower() else captured_by_black).append(symbol)
         piece_order = 'qrbnp'; captured_by_white.sort(key=lambda s:piece_order.find(s.lower())); captured_by_black.sort(key=lambda s:piece_order.find(s.lower()))
-        y_offset = 290
-        self.screen.blit(FONT_SMALL.render("Captured by Black:", True, TEXT_COLOR), (BOARD_SIZE + 20, y_offset))
+        return tuple(captured_by_black), tuple(captured_by_white)
+
+    def paint_captured_pieces(self, captured_by_black, captured_by_white):
+        y_offset = self.captured_rect.y
+        self.screen.blit(self.render_text(FONT_SMALL, "Captured by Black:", TEXT_COLOR), (BOARD_SIZE + 20, y_offset))
         for i, symbol in enumerate(captured_by_black):
-            img = pygame.transform.scale(self.piece_images[symbol], (30,30))
-            self.screen.blit(img, (BOARD_SIZE + 20 + i*32, y_offset + 25))
-        self.screen.blit(FONT_SMALL.render("Captured by White:", True, TEXT_COLOR), (BOARD_SIZE + 20, y_offset + 70))
+            self.screen.blit(self.thumbnails[symbol], (BOARD_SIZE + 20 + i*32, y_offset + 25))
+        self.screen.blit(self.render_text(FONT_SMALL, "Captured by White:", TEXT_COLOR), (BOARD_SIZE + 20, y_offset + 70))
         for i, symbol in enumerate(captured_by_white):
-            img = pygame.transform.scale(self.piece_images[symbol], (30,30))
-            self.screen.blit(img, (BOARD_SIZE + 20 + i*32, y_offset + 95))
-
-    def draw_game_over(self):
-        overlay = pygame.Surface((BOARD_SIZE, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((40, 40, 40, 180))
-        self.screen.blit(overlay, (0, 0))
-        text_surf = FONT_LARGE.render(self.game_over_message, True, (255, 255, 255))
-        self.screen.blit(text_surf, text_surf.get_rect(center=(BOARD_SIZE / 2, HEIGHT / 2)))
-
-    def draw_feedback_overlay(self, text, color):
-        overlay = pygame.Surface((BOARD_SIZE, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 128))
-        text_surf = FONT_LARGE.render(text, True, color)
-        text_rect = text_surf.get_rect(center=(BOARD_SIZE / 2, HEIGHT / 2))
-        self.screen.blit(overlay, (0,0))
-
-        self.screen.blit(text_surf, text_rect)
+            self.screen.blit(self.thumbnails[symbol], (BOARD_SIZE + 20 + i*32, y_offset + 95))
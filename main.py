@@ -1,13 +1,27 @@
+import time
+START = time.perf_counter() # Taken before the imports so --startup-time covers them
+import json
+import sys
 import pygame
 from constants import WIDTH, HEIGHT, SIDEBAR_WIDTH
 from game import Game
 
 def main():
+    timings = {"imports": time.perf_counter() - START}
     pygame.init()
     screen = pygame.display.set_mode((WIDTH + SIDEBAR_WIDTH, HEIGHT))
     pygame.display.set_caption("Upgraded Chess Trainer")
+    timings["window"] = time.perf_counter() - START
     
     game = Game(screen)
+    timings["game"] = time.perf_counter() - START
+    if "--startup-time" in sys.argv:
+        # Seconds from the first import to each stage and to the first frame on screen, as JSON for bench.py startup
+        game.update()
+        timings["first_frame"] = time.perf_counter() - START
+        print(json.dumps(timings))
+        game.worker.close(); pygame.quit()
+        return
     game.run()
 
 if __name__ == "__main__":
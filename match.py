@@ -0,0 +1,207 @@
+import argparse
+import concurrent.futures
+import json
+import math
+import multiprocessing
+import sys
+import time
+import chess
+import chess.pgn
+from engine import EVAL_VARIANTS, TranspositionTable, get_best_move_ai, use_eval_variant
+
+# --- Openings ---
+# Balanced positions a few moves in, so the engines don't repeat one game; each is played once with either engine as White
+OPENING_LINES = [
+    ("italian", "e4 e5 Nf3 Nc6 Bc4 Bc5"), ("ruy_lopez", "e4 e5 Nf3 Nc6 Bb5 a6"), ("sicilian", "e4 c5 Nf3 d6 d4 cxd4 Nxd4 Nf6"),
+    ("french", "e4 e6 d4 d5 Nc3 Nf6"), ("caro_kann", "e4 c6 d4 d5 e5 Bf5"), ("scandinavian", "e4 d5 exd5 Qxd5 Nc3 Qa5"),
+    ("queens_gambit", "d4 d5 c4 e6 Nc3 Nf6"), ("slav", "d4 d5 c4 c6 Nf3 Nf6"), ("kings_indian", "d4 Nf6 c4 g6 Nc3 Bg7 e4 d6"),
+    ("nimzo_indian", "d4 Nf6 c4 e6 Nc3 Bb4"), ("english", "c4 e5 Nc3 Nf6 g3 d5"), ("london", "d4 d5 Bf4 Nf6 e3 c5"),
+]
+
+def _opening_fen(line):
+    board = chess.Board()
+    for san in line.split(): board.push_san(san)
+    return board.fen()
+
+OPENINGS = [(name, _opening_fen(line)) for name, line in OPENING_LINES]
+MAX_PLIES = 400 # Games still going after this many plies are adjudicated drawn
+
+def read_openings(path):
+    # One FEN (or EPD) per line; blank lines and # comments are skipped
+    openings = []
+    with open(path) as handle:
+        for line in handle:
+            line = line.strip()
+            if line and not line.startswith("#"): openings.append((f"{path}:{len(openings) + 1}", chess.Board(line if line.count(" ") >= 5 else line + " 0 1").fen()))
+    return openings
+
+# --- Engine Configurations ---
+def parse_config(spec):
+    # "name:depth=3,time=0.5,nodes=20000,eval=material"; every option is optional and the name defaults to the spec
+    name, colon, options = spec.rpartition(":")
+    if not colon: name, options = spec, ""
+    config = {"name": name or spec, "depth": None, "time_limit": None, "node_limit": None, "eval": "default"}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        try:
+            if key == "depth": config["depth"] = int(value)
+            elif key == "time": config["time_limit"] = float(value)
+            elif key == "nodes": config["node_limit"] = int(value)
+            elif key == "eval" and value in EVAL_VARIANTS: config["eval"] = value
+            else: raise ValueError(option)
+        except ValueError: raise argparse.ArgumentTypeError(f"bad option {option!r}: use depth=N, time=SECONDS, nodes=N or eval={'/'.join(EVAL_VARIANTS)}")
+    return config
+
+# --- Games ---
+_stop_games = None # Event set by run_match once its SPRT has decided; games running in the pool give up at once
+
+def _init_game_process(stop_games):
+    global _stop_games
+    _stop_games = stop_games
+
+def play_game(task):
+    # One game from an opening, adjudicated with the same game-over checks as the trainer. Each side keeps its own
+    # transposition table; per side totals of moves, seconds and nodes come back with the result
+    game_number, opening, fen, white, black, max_plies = task
+    stop = _stop_games.is_set if _stop_games else None
+    board = chess.Board(fen)
+    tables = {chess.WHITE: TranspositionTable(), chess.BLACK: TranspositionTable()}
+    totals = {white["name"]: {"moves": 0, "seconds": 0.0, "nodes": 0}, black["name"]: {"moves": 0, "seconds": 0.0, "nodes": 0}}
+    while not board.is_game_over() and len(board.move_stack) < max_plies and not (stop and stop()):
+        config = white if board.turn == chess.WHITE else black
+        use_eval_variant(config["eval"])
+        start = time.perf_counter()
+        move, stats = get_best_move_ai(board, config["depth"], config["time_limit"], config["node_limit"], tt=tables[board.turn], stop=stop, return_stats=True)
+        side = totals[config["name"]]
+        side["moves"], side["seconds"], side["nodes"] = side["moves"] + 1, side["seconds"] + time.perf_counter() - start, side["nodes"] + stats.nodes
+        board.push(move)
+    result = board.result() if board.is_game_over() else "1/2-1/2"
+    return {"game": game_number, "opening": opening, "fen": fen, "white": white["name"], "black": black["name"], "result": result,
+            "plies": len(board.move_stack), "moves": [move.uci() for move in board.move_stack], "totals": totals}
+
+# --- Statistics ---
+def _expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def _elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+def elo_estimate(wins, draws, losses):
+    # Elo difference and the half-width of its 95% confidence interval, from the first engine's point of view
+    games = wins + draws + losses
+    if not games: return 0.0, float("inf")
+    score = (wins + draws / 2) / games
+    # The spread comes with half a game of each outcome added, as in sprt_llr, so identical results still get an error
+    padded_wins, padded_draws, padded_games = wins + 0.5, draws + 0.5, games + 1.5
+    padded_score = (padded_wins + padded_draws / 2) / padded_games
+    deviation = math.sqrt(((padded_wins + padded_draws / 4) / padded_games - padded_score * padded_score) / padded_games)
+    low, high = _elo(score - 1.96 * deviation), _elo(score + 1.96 * deviation)
+    return _elo(score), (high - low) / 2
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    # Log-likelihood ratio of "elo1 better" against "elo0 better", normal approximation on the trinomial results.
+    # Half a game of each outcome is added so one-sided results (all wins, say) still have a variance
+    wins, draws, losses = wins + 0.5, draws + 0.5, losses + 0.5
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = ((wins + draws / 4) / games - score * score) / games
+    score0, score1 = _expected_score(elo0), _expected_score(elo1)
+    return (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+def sprt_bounds(alpha, beta):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+# --- Match ---
+def run_match(first, second, openings, games, workers, max_plies=MAX_PLIES, sprt=None, pgn=None, log=sys.stderr):
+    # Openings are cycled, each played twice with colors swapped, with at most workers * 2 games in flight. An SPRT
+    # (elo0, elo1, alpha, beta) ends the match as soon as either hypothesis is accepted; games still running then are stopped
+    # and not counted, and queued ones never start
+    tasks = ((number, *openings[number // 2 % len(openings)], *((first, second) if number % 2 == 0 else (second, first)), max_plies) for number in range(games))
+    wins = draws = losses = 0
+    totals = {config["name"]: {"moves": 0, "seconds": 0.0, "nodes": 0} for config in (first, second)}
+    decision, start = None, time.perf_counter()
+    bounds = sprt_bounds(*sprt[2:]) if sprt else None
+    def record(game):
+        nonlocal wins, draws, losses, decision
+        score = {"1-0": 1.0, "0-1": 0.0}.get(game["result"], 0.5)
+        if game["white"] != first["name"]: score = 1 - score
+        wins, draws, losses = wins + (score == 1), draws + (score == 0.5), losses + (score == 0)
+        for name, side in game["totals"].items():
+            for key in side: totals[name][key] += side[key]
+        if pgn: _write_pgn(pgn, game)
+        llr = sprt_llr(wins, draws, losses, *sprt[:2]) if sprt else None
+        print(f"game {game['game'] + 1}: {game['white']} - {game['black']} {game['result']} ({game['opening']}, {game['plies']} plies)  +{wins} ={draws} -{losses}"
+              + (f"  LLR {llr:.2f} [{bounds[0]:.2f}, {bounds[1]:.2f}]" if sprt else ""), file=log)
+        if sprt and (llr <= bounds[0] or llr >= bounds[1]): decision = "H1" if llr >= bounds[1] else "H0"
+    stop_games = multiprocessing.Event()
+    pool = concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_game_process, initargs=(stop_games,))
+    try:
+        pending = set()
+        while True:
+            for task in tasks:
+                pending.add(pool.submit(play_game, task))
+                if len(pending) >= workers * 2: break
+            if not pending: break
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if not decision: record(future.result())
+            if decision: break
+    finally:
+        # Leaving a with block would wait for every game already handed to the pool to be played out
+        stop_games.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+    elo, error = elo_estimate(wins, draws, losses)
+    return {
+        "first": first, "second": second, "games": wins + draws + losses, "wins": wins, "draws": draws, "losses": losses,
+        "elo": elo, "elo_error": error, "seconds": time.perf_counter() - start,
+        "sprt": {"elo0": sprt[0], "elo1": sprt[1], "alpha": sprt[2], "beta": sprt[3], "llr": sprt_llr(wins, draws, losses, *sprt[:2]), "bounds": bounds, "decision": decision} if sprt else None,
+        "per_move": {name: {"moves": side["moves"], "seconds": side["seconds"] / max(side["moves"], 1), "nodes": side["nodes"] / max(side["moves"], 1),
+                            "nps": side["nodes"] / side["seconds"] if side["seconds"] else 0.0} for name, side in totals.items()},
+    }
+
+def _write_pgn(handle, game):
+    board = chess.Board(game["fen"])
+    for uci in game["moves"]: board.push_uci(uci)
+    record = chess.pgn.Game.from_board(board)
+    record.headers.update(Event="match.py", Round=str(game["game"] + 1), White=game["white"], Black=game["black"], Result=game["result"], Opening=game["opening"])
+    print(record, file=handle, end="\n\n")
+
+def print_report(report):
+    first, second, sprt = report["first"]["name"], report["second"]["name"], report["sprt"]
+    print(f"{first} vs {second}: +{report['wins']} ={report['draws']} -{report['losses']} in {report['games']} games ({report['seconds']:.0f}s)")
+    print(f"Elo difference: {report['elo']:+.1f} +/- {report['elo_error']:.1f} (95%)")
+    if sprt:
+        verdict = {"H1": f"{first} is at least {sprt['elo1']:g} Elo stronger", "H0": f"{first} is not {sprt['elo1']:g} Elo stronger"}.get(sprt["decision"], "no decision yet")
+        print(f"SPRT [{sprt['elo0']:g}, {sprt['elo1']:g}]: LLR {sprt['llr']:.2f} [{sprt['bounds'][0]:.2f}, {sprt['bounds'][1]:.2f}], {verdict}")
+    print(f"{'engine':<20} {'moves':>7} {'sec/move':>9} {'nodes/move':>11} {'nps':>8}")
+    for name, side in report["per_move"].items():
+        print(f"{name:<20} {side['moves']:>7} {side['seconds']:>9.3f} {side['nodes']:>11.0f} {side['nps']:>8.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless self-play match between two engine configurations")
+    parser.add_argument("first", type=parse_config, help='e.g. "new:depth=4" or "fast:time=0.1,eval=material"; Elo is reported for this one')
+    parser.add_argument("second", type=parse_config, help="the configuration it is measured against")
+    parser.add_argument("--games", type=int, default=2 * len(OPENINGS), help="games to play, two per opening (default: every opening twice)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--openings", help="file with one opening FEN per line instead of the built-in openings")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES, help="plies after which a game is adjudicated drawn")
+    parser.add_argument("--sprt", type=float, nargs=2, metavar=("ELO0", "ELO1"), help="stop early once an SPRT accepts one of the two Elo hypotheses")
+    parser.add_argument("--alpha", type=float, default=0.05, help="SPRT false positive rate")
+    parser.add_argument("--beta", type=float, default=0.05, help="SPRT false negative rate")
+    parser.add_argument("--pgn", help="write the games to this PGN file, e.g. for review.py")
+    parser.add_argument("--json", action="store_true", help="print machine-readable JSON instead of a summary")
+    args = parser.parse_args()
+    if args.first["name"] == args.second["name"]: parser.error("the two configurations need different names, e.g. a:depth=3 b:depth=4")
+
+    openings = read_openings(args.openings) if args.openings else OPENINGS
+    sprt = (*args.sprt, args.alpha, args.beta) if args.sprt else None
+    pgn = open(args.pgn, "w", encoding="utf-8") if args.pgn else None
+    try: report = run_match(args.first, args.second, openings, args.games, args.workers, args.max_plies, sprt, pgn)
+    finally:
+        if pgn: pgn.close()
+    if args.json: print(json.dumps(report, indent=2))
+    else: print_report(report)
+
+if __name__ == "__main__":
+    main()
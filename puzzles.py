@@ -0,0 +1,150 @@
+import argparse
+import array
+import bisect
+import itertools
+import json
+import mmap
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import chess
+from files import replace_file
+
+# --- Puzzle Database ---
+# A Lichess-format CSV (PuzzleId,FEN,Moves,Rating,RatingDeviation,Popularity,NbPlays,Themes,GameUrl,OpeningTags)
+# gets a one-off binary index next to it: columns of byte offset and rating sorted by rating, then for every theme
+# the ascending positions of its puzzles in those columns, so rating and theme queries are both a bisect.
+# The index is memory-mapped and puzzles are read from the CSV one at a time, so startup time and memory
+# stay flat however large the database is. The index is built ahead of time with `python puzzles.py puzzles.csv`,
+# or in a background process the first time a trainer opens a database without a current one
+MAX_RATING = 65535
+INDEX_VERSION = 2 # Older indexes are rebuilt
+
+def _index_paths(csv_path):
+    return csv_path + ".idx", csv_path + ".idx.json"
+
+def build_index(csv_path):
+    index_path, meta_path = _index_paths(csv_path)
+    offsets, ratings, row_themes, theme_ids = array.array('Q'), array.array('H'), array.array('Q', [0]), array.array('I')
+    theme_numbers = {} # Rows' themes are theme_ids[row_themes[row]:row_themes[row + 1]]
+    with open(csv_path, 'rb') as csv_file:
+        offset = 0
+        for line in csv_file:
+            fields = line.split(b',')
+            if len(fields) >= 8 and fields[3].strip().isdigit():
+                for theme in fields[7].split(): theme_ids.append(theme_numbers.setdefault(theme.decode(), len(theme_numbers)))
+                offsets.append(offset); ratings.append(min(int(fields[3]), MAX_RATING)); row_themes.append(len(theme_ids))
+            offset += len(line)
+    # Counting sort by rating keeps the build at O(n) time and no extra per-row Python objects
+    starts = [0] * (MAX_RATING + 2)
+    for rating in ratings: starts[rating + 1] += 1
+    for rating in range(1, len(starts)): starts[rating] += starts[rating - 1]
+    order = array.array('Q', bytes(8 * len(ratings)))
+    for row, rating in enumerate(ratings):
+        order[starts[rating]] = row; starts[rating] += 1
+    theme_rows = [array.array('I') for _ in theme_numbers]
+    for position, row in enumerate(order):
+        for theme in theme_ids[row_themes[row]:row_themes[row + 1]]: theme_rows[theme].append(position)
+    theme_starts = list(itertools.accumulate((len(rows) for rows in theme_rows), initial=0))
+    def write_columns(index_file):
+        array.array('Q', (offsets[row] for row in order)).tofile(index_file)
+        for rows in theme_rows: rows.tofile(index_file)
+        array.array('H', (ratings[row] for row in order)).tofile(index_file)
+    replace_file(index_path, write_columns)
+    # The metadata goes last: until it names this CSV, the index counts as stale
+    stat = os.stat(csv_path)
+    meta = {"version": INDEX_VERSION, "count": len(ratings), "csv_size": stat.st_size, "csv_mtime_ns": stat.st_mtime_ns,
+            "themes": sorted(theme_numbers, key=theme_numbers.get), "theme_starts": theme_starts}
+    replace_file(meta_path, lambda meta_file: meta_file.write(json.dumps(meta).encode()))
+    return len(ratings)
+
+def _index_is_current(csv_path):
+    index_path, meta_path = _index_paths(csv_path)
+    if not (os.path.exists(index_path) and os.path.exists(meta_path)): return False
+    with open(meta_path) as meta_file: meta = json.load(meta_file)
+    stat = os.stat(csv_path)
+    return meta.get("version") == INDEX_VERSION and meta["csv_size"] == stat.st_size and meta["csv_mtime_ns"] == stat.st_mtime_ns
+
+class PuzzleStore:
+    def __init__(self, csv_path):
+        if not _index_is_current(csv_path): build_index(csv_path)
+        index_path, meta_path = _index_paths(csv_path)
+        with open(meta_path) as meta_file: meta = json.load(meta_file)
+        starts = meta["theme_starts"]
+        self.count, self.theme_ranges = meta["count"], {theme: (starts[i], starts[i + 1]) for i, theme in enumerate(meta["themes"])}
+        self.csv_file, self.index_file, self.index_map = open(csv_path, 'rb'), open(index_path, 'rb'), None
+        if self.count:
+            self.index_map = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            view, n, rows_end = memoryview(self.index_map), self.count, 8 * self.count + 4 * starts[-1]
+            self.offsets, self.theme_rows, self.ratings = view[:8 * n].cast('Q'), view[8 * n:rows_end].cast('I'), view[rows_end:rows_end + 2 * n].cast('H')
+        else: self.offsets = self.theme_rows = self.ratings = ()
+
+    def __len__(self):
+        return self.count
+
+    def find(self, min_rating=0, max_rating=MAX_RATING, theme=None, after=-1):
+        # Index of the first puzzle past `after` (in rating order) within the rating range and with the theme, or None
+        start, end = max(bisect.bisect_left(self.ratings, min_rating), after + 1), bisect.bisect_right(self.ratings, max_rating)
+        if theme is None: return start if start < end else None
+        if theme not in self.theme_ranges: return None
+        # The theme's positions ascend, so the first one at or past start is the answer if it's still in the range
+        first, last = self.theme_ranges[theme]
+        found = bisect.bisect_left(self.theme_rows, start, first, last)
+        return self.theme_rows[found] if found < last and self.theme_rows[found] < end else None
+
+    def load(self, index):
+        # Lichess puzzles start one move early: the first move is the opponent's, the rest is the solution
+        self.csv_file.seek(self.offsets[index])
+        fields = self.csv_file.readline().decode().rstrip("\r\n").split(",")
+        board, moves = chess.Board(fields[1]), fields[2].split()
+        board.push_uci(moves[0])
+        return {
+            "id": fields[0], "fen": board.fen(), "solution": moves[1:], "rating": int(fields[3]), "themes": fields[7].split(),
+            "goal": f"{'White' if board.turn == chess.WHITE else 'Black'} to move, rated {fields[3]}",
+        }
+
+    def next_puzzle(self, min_rating=0, max_rating=MAX_RATING, theme=None, after=-1):
+        index = self.find(min_rating, max_rating, theme, after)
+        return None if index is None else (index, self.load(index))
+
+    def close(self):
+        if self.index_map:
+            for column in (self.offsets, self.theme_rows, self.ratings): column.release()
+            self.index_map.close()
+        self.index_file.close(); self.csv_file.close()
+
+_index_builds = {} # csv path -> background build process started by open_puzzle_store
+
+def _build_in_background(csv_path):
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit()) # The trainer exiting mid-build still cleans up the temporary files
+    build_index(csv_path)
+
+def index_build_running(csv_path):
+    build = _index_builds.get(csv_path)
+    return build is not None and build.is_alive()
+
+def open_puzzle_store(csv_path):
+    # The store, or None without a database. A missing or stale index is never built here: one build per database is
+    # started in a background process and None returned until it is done, so call again later (see index_build_running)
+    if not csv_path or not os.path.exists(csv_path): return None
+    if _index_is_current(csv_path): return PuzzleStore(csv_path)
+    if csv_path not in _index_builds:
+        _index_builds[csv_path] = multiprocessing.Process(target=_build_in_background, args=(csv_path,), daemon=True)
+        _index_builds[csv_path].start()
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the index of a Lichess puzzle database ahead of the trainer's first launch")
+    parser.add_argument("csv", nargs="?", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "puzzles.csv"))
+    parser.add_argument("--force", action="store_true", help="rebuild an index that is already current")
+    args = parser.parse_args()
+
+    if not args.force and _index_is_current(args.csv): return
+    start = time.perf_counter()
+    count = build_index(args.csv)
+    print(f"{args.csv}: {count} puzzles indexed in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import collections
+import concurrent.futures
+import json
+import sys
+import time
+import chess
+import chess.pgn
+from analysis_cache import open_cache
+from engine import GOOD_MOVE, HINT_DEPTH, Searcher, analyze_move, transposition_table
+
+# --- Game Review ---
+def read_games(paths):
+    # Yields (game number, headers, starting FEN, UCI moves) one game at a time, never holding a whole file
+    game_number = 0
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as handle:
+            while True:
+                game = chess.pgn.read_game(handle)
+                if game is None: break
+                game_number += 1
+                headers = {key: game.headers.get(key, "?") for key in ("Event", "White", "Black", "Result")}
+                yield game_number, headers, game.board().fen(), [move.uci() for move in game.mainline_moves()]
+
+_caches = {} # Analysis cache per path, opened once in each pool process
+
+def review_game(task):
+    # Same feedback the trainer gives a player, for every move of one game: label plus best-move hint when it wasn't good
+    game_number, headers, fen, moves, depth, cache_path = task
+    if cache_path and cache_path not in _caches: _caches[cache_path] = open_cache(cache_path)
+    cache = _caches.get(cache_path)
+    transposition_table.clear() # Each game starts fresh, like a new game in the trainer
+    board, lines = chess.Board(fen), []
+    for ply, uci in enumerate(moves, 1):
+        move = chess.Move.from_uci(uci)
+        if move not in board.legal_moves: break
+        searcher = Searcher()
+        scores = searcher.score_moves(board, depth, moves=[move]) # One search gives both the label and the best move
+        if cache is not None and scores: cache.put(board, depth, searcher.score, scores[0][0])
+        label, eval_change, best_move = analyze_move(board, move, scores=scores)
+        if label == GOOD_MOVE: best_move = None
+        lines.append({
+            "game": game_number, "white": headers["White"], "black": headers["Black"], "event": headers["Event"],
+            "ply": ply, "color": "white" if board.turn == chess.WHITE else "black", "move": uci, "san": board.san(move),
+            "label": label, "eval_change": eval_change, "best_move": best_move.uci() if best_move else None,
+        })
+        board.push(move)
+    return lines
+
+def run_review(paths, output, workers, depth, cache_path=None, max_pending=None):
+    # Games are handed to the pool in input order with only a bounded number in flight, so memory doesn't grow with the input
+    max_pending = max_pending or workers * 4
+    games = moves = 0
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        pending = collections.deque()
+        def write_oldest():
+            nonlocal games, moves
+            lines = pending.popleft().result()
+            for line in lines: output.write(json.dumps(line) + "\n")
+            games, moves = games + 1, moves + len(lines)
+        for game_number, headers, fen, game_moves in read_games(paths):
+            pending.append(pool.submit(review_game, (game_number, headers, fen, game_moves, depth, cache_path)))
+            if len(pending) >= max_pending: write_oldest()
+        while pending: write_oldest()
+    elapsed = time.perf_counter() - start
+    return games, moves, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless move-by-move review of PGN games, one JSON line per move")
+    parser.add_argument("pgn", nargs="+", help="PGN files to review")
+    parser.add_argument("-o", "--output", help="JSONL file to write (default: stdout)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=HINT_DEPTH, help="search depth for move labels and best-move hints")
+    parser.add_argument("--cache", help="persistent analysis cache to fill with best moves, e.g. the trainer's")
+    args = parser.parse_args()
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try: games, moves, elapsed = run_review(args.pgn, output, args.workers, args.depth, args.cache)
+    finally:
+        if args.output: output.close()
+    print(f"Reviewed {games} games ({moves} moves) in {elapsed:.1f}s: {games / max(elapsed, 1e-9):.2f} games/sec", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
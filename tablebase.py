@@ -0,0 +1,261 @@
+import argparse
+import array
+import itertools
+import mmap
+import os
+import sys
+import time
+import chess
+import chess.syzygy
+from files import replace_file
+
+# --- Generated Endgame Tablebases ---
+# Perfect play for tiny material, found offline by retrograde analysis: one file per material signature ("KQvK.dtm"),
+# one byte per position (side to move x a square per piece): 0 for draws and impossible positions, 1..127 for a win
+# in that many plies and LOSS + n for a loss in n plies, so a probe is a single lookup in a memory-mapped file.
+# Without castling every position plays like its left/right mirror image, so tables only hold positions with the
+# white king on files a-d and the others are probed mirrored; that halves both the files and the time to generate them.
+# Tables only exist with White as the side named first; positions with the colours swapped are probed mirrored.
+# Castling and en passant rights aren't part of the index (positions with them are never probed), nor is the fifty-move rule.
+# The generator can't leave en passant out of a table with pawns on both sides, where a double push may allow one:
+# such tables (KPvKP) aren't generated or loaded until the index has an en passant state
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases") # Where the trainer looks, whatever the cwd
+EXTENSION = ".dtm"
+LOSS = 128
+MAX_PLIES = 127
+THREE_MAN = ["KQvK", "KRvK", "KPvK"]
+# Dependency order: a table's captures and promotions lead into tables listed before it
+FOUR_MAN = [
+    "KQvKQ", "KQvKR", "KQvKB", "KQvKN", "KRvKR", "KRvKB", "KRvKN", "KBvKB", "KBvKN", "KNvKN",
+    "KQQvK", "KQRvK", "KQBvK", "KQNvK", "KRRvK", "KRBvK", "KRNvK", "KBBvK", "KBNvK", "KNNvK",
+    "KQvKP", "KRvKP", "KBvKP", "KNvKP", "KQPvK", "KRPvK", "KBPvK", "KNPvK", "KPPvK",
+]
+
+def material_key(board, color=chess.WHITE):
+    # e.g. "KRvKP"; color's pieces are named first
+    return "v".join("".join(letter * len(board.pieces(chess.PIECE_SYMBOLS.index(letter.lower()), side)) for letter in "KQRBNP") for side in (color, not color))
+
+def _has_en_passant(name):
+    return all("P" in side for side in name.split("v"))
+
+def _slots(name):
+    # (color, piece type) of each square in the index, in the order the signature names them
+    white, black = name.split("v")
+    return [(color, chess.PIECE_SYMBOLS.index(letter.lower())) for color, side in ((chess.WHITE, white), (chess.BLACK, black)) for letter in side]
+
+def _index(squares, turn):
+    index = 0
+    for square in reversed(squares): index = index << 6 | square
+    return index << 1 | (turn == chess.BLACK)
+
+# The white king is always the first slot, so bit 3 of an index is the high bit of its file: set on files e-h
+KING_ON_RIGHT = 8
+
+def _mirror_mask(slots):
+    # XORed into an index, flips every piece's file: the position's left/right mirror image
+    return sum(7 << (1 + 6 * slot) for slot in range(len(slots)))
+
+def _canonical(index, mirror_mask):
+    return index ^ mirror_mask if index & KING_ON_RIGHT else index
+
+def _compact(index):
+    # Position in the file of a canonical index, i.e. the index with bit 3 (always clear) taken out
+    return index >> 4 << 3 | index & 7
+
+def _table_size(slots):
+    return 1 << 6 * len(slots) # Half of the 2 << 6 * len(slots) indices
+
+def _decode(value):
+    # (wdl, plies to mate) for the side to move
+    if not value: return 0, 0
+    return (1, value) if value < LOSS else (-1, value - LOSS)
+
+class GeneratedTable:
+    def __init__(self, path, name):
+        self.slots = _slots(name)
+        self.mirror_mask = _mirror_mask(self.slots)
+        with open(path, 'rb') as table_file: self.data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) != _table_size(self.slots):
+            self.data.close()
+            raise ValueError(f"{path} is not a {name} table")
+
+    def probe(self, board):
+        pieces, squares = {}, []
+        for color, piece_type in self.slots:
+            if (color, piece_type) not in pieces: pieces[color, piece_type] = iter(board.pieces(piece_type, color))
+            squares.append(next(pieces[color, piece_type]))
+        return _decode(self.data[_compact(_canonical(_index(squares, board.turn), self.mirror_mask))])
+
+    def close(self):
+        self.data.close()
+
+class Tablebases:
+    # Generated tables from one directory plus, optionally, a directory of Syzygy files (WDL only in the search,
+    # DTZ to pick moves at the root). Probes return (wdl, plies) for the side to move, plies being None for Syzygy
+    def __init__(self, directory=None, syzygy_directory=None):
+        self.tables, self.syzygy, self.max_pieces = {}, None, 0
+        if directory and os.path.isdir(directory):
+            for file_name in os.listdir(directory):
+                name = file_name[:-len(EXTENSION)]
+                if file_name.endswith(EXTENSION) and not _has_en_passant(name):
+                    try: self.tables[name] = GeneratedTable(os.path.join(directory, file_name), name)
+                    except ValueError: continue # Left by an older layout (or not a table at all) until it is generated again
+                    self.max_pieces = max(self.max_pieces, len(name) - 1)
+        if syzygy_directory and os.path.isdir(syzygy_directory):
+            self.syzygy = chess.syzygy.open_tablebase(syzygy_directory)
+            self.max_pieces = max([self.max_pieces] + [len(name) - 1 for name in self.syzygy.wdl])
+
+    def __bool__(self):
+        return bool(self.max_pieces)
+
+    def probe(self, board):
+        if chess.popcount(board.occupied) > self.max_pieces or board.castling_rights: return None
+        if board.ep_square is not None and board.has_legal_en_passant(): return None
+        table = self.tables.get(material_key(board))
+        if table: return table.probe(board)
+        table = self.tables.get(material_key(board, chess.BLACK))
+        if table: return table.probe(board.mirror())
+        if self.syzygy is None: return None
+        wdl = self.syzygy.get_wdl(board)
+        if wdl is None: return None
+        return (1 if wdl == 2 else -1 if wdl == -2 else 0), None # Cursed wins and blessed losses are draws under the fifty-move rule
+
+    def best_move(self, board):
+        # Perfect play at the root: (move, wdl, plies to mate or None) for the side to move, or None unless every move's outcome is known.
+        # Wins go for the quickest mate (smallest DTZ with Syzygy), losses hold out longest
+        if chess.popcount(board.occupied) > self.max_pieces: return None
+        best, best_rank = None, None
+        for move in board.legal_moves:
+            board.push(move)
+            try:
+                result = (0, 0) if board.is_insufficient_material() else self.probe(board)
+                # Syzygy results carry no mate distance, the distance to the next capture or pawn move ranks them instead
+                distance = result and (result[1] if result[1] is not None else abs(self.syzygy.get_dtz(board) or 0))
+            finally: board.pop()
+            if result is None: return None
+            wdl, plies = result
+            rank = (-wdl, distance if wdl > 0 else -distance)
+            if best_rank is None or rank > best_rank: best, best_rank = (move, -wdl, plies + 1 if plies is not None and wdl else plies), rank
+        return best
+
+    def close(self):
+        for table in self.tables.values(): table.close()
+        if self.syzygy: self.syzygy.close()
+
+def open_tablebases(directory=DEFAULT_DIRECTORY, syzygy_directory=None):
+    tablebases = Tablebases(directory, syzygy_directory)
+    return tablebases if tablebases else None
+
+# --- Retrograde Generation ---
+ILLEGAL, NO_LOSS = 0xFFFF, 0xFFFE # Move counter markers: impossible position, and one that can't be lost (a move draws or wins)
+
+def _origins(piece_type, color, square, occupied):
+    # Empty squares a piece now on square could have moved from without capturing
+    if piece_type == chess.PAWN:
+        step = -8 if color == chess.WHITE else 8
+        one, start_rank = square + step, 3 if color == chess.WHITE else 4
+        if not 8 <= one < 56 or chess.BB_SQUARES[one] & occupied: return 0
+        two = one + step
+        return chess.BB_SQUARES[one] | (chess.BB_SQUARES[two] if chess.square_rank(square) == start_rank and not chess.BB_SQUARES[two] & occupied else 0)
+    if piece_type == chess.KING: attacks = chess.BB_KING_ATTACKS[square]
+    elif piece_type == chess.KNIGHT: attacks = chess.BB_KNIGHT_ATTACKS[square]
+    else:
+        attacks = 0
+        if piece_type in (chess.BISHOP, chess.QUEEN): attacks |= chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+        if piece_type in (chess.ROOK, chess.QUEEN):
+            attacks |= chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied]
+    return attacks & ~occupied
+
+def _unmoves(index, slots):
+    # Indices of the positions one non-capturing, non-promoting move before this one
+    mover = bool(index & 1) # The side that just moved, i.e. not the side to move: the turn bit is set when Black is to move
+    squares = [index >> (1 + 6 * slot) & 63 for slot in range(len(slots))]
+    occupied = 0
+    for square in squares: occupied |= chess.BB_SQUARES[square]
+    previous = index ^ 1
+    for slot, (color, piece_type) in enumerate(slots):
+        if color != mover: continue
+        for origin in chess.scan_forward(_origins(piece_type, color, squares[slot], occupied)):
+            yield previous + ((origin - squares[slot]) << (1 + 6 * slot))
+
+def generate(name, directory=DEFAULT_DIRECTORY):
+    # Forward pass: every legal position's moves are counted, and captures and promotions are looked up in the smaller
+    # tables they lead to. Backward pass: positions are settled in order of plies to mate, starting from checkmates;
+    # a lost position makes everything one move before it won, and a position whose moves all turn out won for the
+    # opponent is lost. Whatever is never settled is a draw. Only positions with the white king on files a-d are
+    # visited: a move or unmove that crosses to the other half lands on the mirror image of a canonical position
+    slots = _slots(name)
+    if slots.count((chess.WHITE, chess.KING)) != 1 or slots.count((chess.BLACK, chess.KING)) != 1: raise ValueError(f"{name}: each side needs one king")
+    if _has_en_passant(name): raise ValueError(f"{name}: pawns on both sides need en passant in the index")
+    smaller = Tablebases(directory)
+    size, mirror_mask = 2 << 6 * len(slots), _mirror_mask(slots)
+    # win_plies is the earliest bucket a position waits in as a win, so each is queued once however many losses lead to it
+    values, loss_plies, win_plies, remaining = bytearray(size), bytearray(size), bytearray(size), array.array('H', [ILLEGAL]) * size
+    buckets = [array.array('I') for _ in range(MAX_PLIES + 2)]
+    board, pieces = chess.Board(None), [chess.Piece(piece_type, color) for color, piece_type in slots]
+    for squares in itertools.product(range(64), repeat=len(slots)):
+        if len(set(squares)) < len(squares): continue
+        if squares[0] & 4: continue # White king on files e-h: its mirror image stands for it
+        if any(piece.piece_type == chess.PAWN and not 8 <= square < 56 for piece, square in zip(pieces, squares)): continue
+        board.set_piece_map(dict(zip(squares, pieces)))
+        for turn in chess.COLORS:
+            board.turn = turn
+            if board.is_attacked_by(turn, board.king(not turn)): continue
+            index, in_table, best_win, worst_loss, can_lose = _index(squares, turn), 0, None, 0, True
+            moves = list(board.generate_legal_moves())
+            for move in moves:
+                if not move.promotion and not board.is_capture(move):
+                    in_table += 1
+                    continue
+                board.push(move)
+                try:
+                    result = (0, 0) if board.is_insufficient_material() else smaller.probe(board)
+                    if result is None: raise ValueError(f"{name} needs the {material_key(board)} table first")
+                finally: board.pop()
+                wdl, plies = result
+                if wdl < 0: best_win = plies + 1 if best_win is None else min(best_win, plies + 1)
+                elif wdl > 0: worst_loss = max(worst_loss, plies + 1)
+                else: can_lose = False
+            if best_win is not None: remaining[index], win_plies[index] = NO_LOSS, best_win; buckets[best_win].append(index)
+            elif not can_lose or (not moves and not board.is_check()): remaining[index] = NO_LOSS # Stalemate included
+            else:
+                remaining[index], loss_plies[index] = in_table, worst_loss
+                if not in_table: buckets[worst_loss].append(index) # Checkmate, or only captures and promotions that lose
+    for plies in range(MAX_PLIES + 1):
+        for index in buckets[plies]:
+            if values[index]: continue
+            values[index] = plies if plies & 1 else LOSS + plies
+            for previous in _unmoves(index, slots):
+                previous = _canonical(previous, mirror_mask)
+                count = remaining[previous]
+                if count == ILLEGAL or values[previous]: continue
+                if not plies & 1:
+                    if not win_plies[previous] or win_plies[previous] > plies + 1: win_plies[previous] = plies + 1; buckets[plies + 1].append(previous)
+                elif count != NO_LOSS:
+                    loss_plies[previous], remaining[previous] = max(loss_plies[previous], plies + 1), count - 1
+                    if count == 1: buckets[loss_plies[previous]].append(previous)
+        buckets[plies] = None # Settled
+    if any(buckets[MAX_PLIES + 1]): raise ValueError(f"{name} has mates longer than {MAX_PLIES} plies")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name + EXTENSION)
+    # Only the canonical half is written, in runs of the 8 indices below each KING_ON_RIGHT bit; a half-written table is never picked up
+    replace_file(path, lambda table_file: table_file.write(b"".join(values[start:start + 8] for start in range(0, size, 16))))
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate endgame tablebases for the engine by retrograde analysis")
+    parser.add_argument("tables", nargs="*", help=f"material signatures in dependency order (default: {' '.join(THREE_MAN)})")
+    parser.add_argument("--four", action="store_true", help="also the 4-man tables (all but KPvKP); each takes about 8 minutes in pure Python and 16 MB on disk")
+    parser.add_argument("-d", "--directory", default=DEFAULT_DIRECTORY)
+    parser.add_argument("--force", action="store_true", help="regenerate tables that already exist")
+    args = parser.parse_args()
+
+    for name in args.tables or THREE_MAN + (FOUR_MAN if args.four else []):
+        path = os.path.join(args.directory, name + EXTENSION)
+        if not args.force and os.path.exists(path) and os.path.getsize(path) == _table_size(_slots(name)): continue # Current already
+        start = time.perf_counter()
+        path = generate(name, args.directory)
+        print(f"{path}: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
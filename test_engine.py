@@ -0,0 +1,211 @@
+import random
+import chess
+import chess.polyglot
+import pytest
+from engine import IncrementalEvaluator, evaluate_board
+
+# --- Incremental Evaluation ---
+# Special positions the random games below start from too, so castling, en passant and promotions are always played
+START_FENS = [
+    chess.STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", # Castling both ways, both sides
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3", # En passant
+    "8/1P4k1/8/8/8/8/5Kp1/8 w - - 0 1", # Promotions, including under-promotions and in the endgame king table
+    "r3k2r/1P6/8/8/8/8/1p6/R3K2R w KQkq - 0 1", # Promotions with captures onto castling rooks
+]
+
+def _check(evaluator, board):
+    assert evaluator.evaluate() == evaluate_board(board), board.fen()
+    assert evaluator.zobrist_key() == chess.polyglot.zobrist_hash(board), board.fen()
+
+def test_incremental_evaluator_matches_evaluate_board():
+    rng, seen = random.Random(20261018), {"castling": 0, "en_passant": 0, "promotion": 0}
+    for game in range(60):
+        board = chess.Board(START_FENS[game % len(START_FENS)])
+        evaluator = IncrementalEvaluator(board)
+        _check(evaluator, board)
+        for ply in range(120):
+            moves = list(board.legal_moves)
+            if not moves: break
+            # Special moves are preferred, so every game tries them whenever they are legal
+            special = [move for move in moves if board.is_castling(move) or board.is_en_passant(move) or move.promotion]
+            move = rng.choice(special if special and rng.random() < 0.5 else moves)
+            seen["castling"] += board.is_castling(move); seen["en_passant"] += board.is_en_passant(move); seen["promotion"] += bool(move.promotion)
+            evaluator.push(move)
+            _check(evaluator, board)
+            if rng.random() < 0.2: # Pop and replay, as the search does
+                evaluator.pop()
+                _check(evaluator, board)
+                evaluator.push(move)
+        while board.move_stack: # Unwinding all the way must restore every start-of-game term
+            evaluator.pop()
+            _check(evaluator, board)
+    assert all(seen.values()), seen
+
+# --- Batch Evaluation ---
+# Random games seldom end in mate, so the game-over scores get positions of their own: mated, stalemated, and mate in one
+GAME_OVER_FENS = [
+    "rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3",
+    "7k/5Q2/6K1/8/8/8/8/8 b - - 0 1",
+    "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1",
+]
+
+def _corpus(games=40, plies=80):
+    # The start positions and every position of seeded random games from them
+    rng = random.Random(20261019)
+    for game in range(games):
+        board = chess.Board(START_FENS[game % len(START_FENS)])
+        yield board.copy()
+        for _ in range(plies):
+            moves = list(board.legal_moves)
+            if not moves: break
+            board.push(rng.choice(moves))
+            yield board.copy()
+
+def test_batch_eval_matches_evaluate_board():
+    pytest.importorskip("numpy")
+    from batch_eval import evaluate_boards, evaluate_children
+    boards = list(_corpus()) + [chess.Board(fen) for fen in GAME_OVER_FENS]
+    assert [int(score) for score in evaluate_boards(boards)] == [evaluate_board(board) for board in boards]
+    for board in boards[::7] + boards[-len(GAME_OVER_FENS):]:
+        moves, scores = evaluate_children(board)
+        expected = []
+        for move in moves:
+            board.push(move); expected.append(evaluate_board(board)); board.pop()
+        assert [int(score) for score in scores] == expected, board.fen()
+
+# --- Transposition Table ---
+def test_tt_scores_count_mates_and_tablebase_wins_from_the_entry():
+    from engine import MATE_SCORE, TABLEBASE_WIN_SCORE, _score_from_tt, _score_to_tt
+    # Stored at ply 5 and found again at ply 7: the win or mate is the same distance from the entry, two plies further from the root
+    for score in (TABLEBASE_WIN_SCORE - 5, MATE_SCORE - 5 - 3):
+        assert _score_from_tt(_score_to_tt(score, 5), 7) == score - 2
+        assert _score_from_tt(_score_to_tt(-score, 5), 7) == -score + 2
+    assert _score_from_tt(_score_to_tt(1234, 5), 7) == 1234 # Evaluations don't depend on the ply
+
+def test_tt_size_and_replacement():
+    from engine import EXACT, LOWER_BOUND, TT_ENTRY_BYTES, TranspositionTable
+    assert TranspositionTable(4).size == 4 * 1024 * 1024 // TT_ENTRY_BYTES
+    table, move = TranspositionTable(1), chess.Move.from_uci("e2e4")
+    table.store(12345, 5, 10, EXACT, move)
+    table.store(12345, 3, 20, LOWER_BOUND, None) # Shallower, same search: kept out
+    assert table.probe(12345)[1:5] == (5, 10, EXACT, move)
+    table.store(12345, 5, 30, EXACT, move) # Equal depth replaces
+    assert table.probe(12345)[2] == 30
+    table.new_search()
+    table.store(12345 + table.size, 1, 40, LOWER_BOUND, None) # Same slot, older search: always replaced
+    assert table.probe(12345) is None and table.probe(12345 + table.size)[1:4] == (1, 40, LOWER_BOUND)
+
+# --- Parallel Root Search ---
+def test_parallel_search_matches_serial():
+    from bench import BENCH_POSITIONS
+    from engine import Searcher, TranspositionTable
+    for _, fen in BENCH_POSITIONS:
+        serial, parallel = Searcher(TranspositionTable()), Searcher(TranspositionTable())
+        serial_move = serial.search(chess.Board(fen), depth=3)
+        parallel_move = parallel.search(chess.Board(fen), depth=3, workers=2)
+        assert (parallel_move, parallel.score) == (serial_move, serial.score), fen
+
+# --- Move Feedback ---
+def test_score_moves_labels_match_full_window_scores():
+    from bench import BENCH_POSITIONS
+    from engine import INFINITE_SCORE, Searcher, TranspositionTable, _move_label, analyze_move
+    for _, fen in BENCH_POSITIONS[:6]:
+        board, searcher = chess.Board(fen), Searcher(TranspositionTable(16))
+        scores = searcher.score_moves(board, 3)
+        best_score = scores[0][1]
+        for move, score in scores:
+            # The same searcher, so the table holds the same entries the bucketing searches saw
+            exact = searcher._search_root_move(board, move, 3, -INFINITE_SCORE, INFINITE_SCORE)
+            assert _move_label(score - best_score) == _move_label(exact - best_score), (fen, move, score, exact)
+        # Given the move, its score is exact rather than a bound
+        move = scores[-1][0]
+        searcher = Searcher(TranspositionTable(16))
+        scores = searcher.score_moves(board, 3, moves=[move])
+        _, eval_change, _ = analyze_move(board, move, scores=scores)
+        assert eval_change == searcher._search_root_move(board, move, 3, -INFINITE_SCORE, INFINITE_SCORE) - scores[0][1], fen
+
+# --- Analysis Cache ---
+def test_cached_mate_answers_later_searches(tmp_path):
+    from analysis_cache import AnalysisCache
+    from engine import PUZZLES, get_best_move_ai
+    cache, board = AnalysisCache(str(tmp_path / "analysis.sqlite3")), chess.Board(PUZZLES[1]["fen"]) # Mate in one, found at depth 1
+    try:
+        first, stats = get_best_move_ai(board, depth=3, cache=cache, return_stats=True)
+        assert stats.source == "search"
+        for search_args in ({"depth": 3}, {"time_limit": 1.0}):
+            move, stats = get_best_move_ai(board, cache=cache, return_stats=True, **search_args)
+            assert (move, stats.source) == (first, "cache")
+    finally: cache.close()
+
+# --- Puzzle Database ---
+PUZZLE_THEMES = ["fork", "pin", "mateIn1", "mateIn2", "endgame", "short"]
+
+def test_puzzle_store_find_matches_brute_force(tmp_path):
+    from puzzles import PuzzleStore
+    rng, csv_path = random.Random(20261020), tmp_path / "puzzles.csv"
+    lines = ["PuzzleId,FEN,Moves,Rating,RatingDeviation,Popularity,NbPlays,Themes,GameUrl,OpeningTags"]
+    for number in range(300):
+        themes = " ".join(rng.sample(PUZZLE_THEMES, rng.randint(0, 3)))
+        lines.append(f"p{number},{chess.STARTING_FEN},e2e4 e7e5,{rng.randint(600, 2600)},75,90,100,{themes},https://lichess.org/x,")
+    csv_path.write_text("\n".join(lines) + "\n")
+    store = PuzzleStore(str(csv_path))
+    try:
+        puzzles = [store.load(index) for index in range(len(store))]
+        assert len(puzzles) == 300 and [puzzle["rating"] for puzzle in puzzles] == sorted(puzzle["rating"] for puzzle in puzzles)
+        for _ in range(3000):
+            low = rng.randint(500, 2700)
+            high, theme, after = low + rng.randint(-100, 800), rng.choice(PUZZLE_THEMES + [None, "absent"]), rng.randint(-1, 310)
+            expected = next((index for index, puzzle in enumerate(puzzles) if index > after and low <= puzzle["rating"] <= high
+                             and (theme is None or theme in puzzle["themes"])), None)
+            assert store.find(low, high, theme, after) == expected, (low, high, theme, after)
+    finally: store.close()
+
+# --- Endgame Tablebases ---
+def _child_result(tables, board):
+    # What the table should say about board, from the table results of its children
+    moves = list(board.legal_moves)
+    if not moves: return (-1, 0) if board.is_check() else (0, 0)
+    children = []
+    for move in moves:
+        board.push(move)
+        children.append((0, 0) if board.is_insufficient_material() else tables.probe(board))
+        board.pop()
+    if any(wdl < 0 for wdl, _ in children): return 1, min(plies for wdl, plies in children if wdl < 0) + 1
+    if all(wdl > 0 for wdl, _ in children): return -1, max(plies for _, plies in children) + 1
+    return 0, 0
+
+def test_generated_tablebase_matches_its_children(tmp_path):
+    from tablebase import Tablebases, generate
+    generate("KQvK", str(tmp_path))
+    tables, rng, checked = Tablebases(str(tmp_path)), random.Random(20261021), 0
+    try:
+        while checked < 3000:
+            squares = rng.sample(chess.SQUARES, 3)
+            board = chess.Board(None)
+            for square, symbol in zip(squares, rng.choice(["KQk", "kqK"])): board.set_piece_at(square, chess.Piece.from_symbol(symbol))
+            board.turn = rng.choice(chess.COLORS)
+            if not board.is_valid(): continue
+            # Both colours and both halves of the board, so the mirrored probes are covered too
+            assert tables.probe(board) == _child_result(tables, board), board.fen()
+            checked += 1
+    finally: tables.close()
+
+# --- Match Statistics ---
+def test_elo_estimate_known_values():
+    from match import elo_estimate
+    assert elo_estimate(0, 0, 0) == (0.0, float("inf"))
+    elo, error = elo_estimate(60, 20, 20) # A 70% score
+    assert elo == pytest.approx(147.19, abs=0.01) and error == pytest.approx(65.65, abs=0.01)
+    assert elo_estimate(20, 20, 60)[0] == pytest.approx(-147.19, abs=0.01)
+    assert elo_estimate(10, 30, 10)[0] == pytest.approx(0.0, abs=1e-9)
+    elo, error = elo_estimate(0, 12, 0) # Identical results still get a spread
+    assert elo == pytest.approx(0.0, abs=1e-9) and 0 < error < float("inf")
+
+def test_sprt_llr_known_values():
+    from match import sprt_bounds, sprt_llr
+    lower, upper = sprt_bounds(0.05, 0.05)
+    assert lower == pytest.approx(-2.944, abs=1e-3) and upper == pytest.approx(2.944, abs=1e-3)
+    assert sprt_llr(30, 40, 30, 0, 10) == pytest.approx(-0.0699, abs=1e-4) # Even results lean slightly towards elo0
+    llr = sprt_llr(70, 20, 10, 0, 10)
+    assert llr == pytest.approx(3.755, abs=1e-3) and llr > upper # Enough to accept elo1
@@ -0,0 +1,143 @@
+import chess.polyglot
+import engine
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+from analysis_cache import DEFAULT_CACHE_PATH, open_cache
+from engine import BOOK_MAX_PLY, DEFAULT_DEPTH, HINT_DEPTH, MAX_SEARCH_DEPTH, SearchStats, Searcher, analyze_move, enable_profiling, get_best_move_ai, load_opening_book, load_tablebases, transposition_table
+
+# --- Worker Process ---
+def _worker_main(requests, results, cancelled_up_to, cache_path, book_path, book_max_ply, tablebase_path, syzygy_path, log_path, profile_path):
+    # Runs in its own process so searches never hold the GIL the pygame loop needs
+    signal.signal(signal.SIGTERM, signal.SIG_DFL) # A forked child inherits pygame's handler, which would ignore terminate()
+    cache = open_cache(cache_path) if cache_path else None
+    if log_path: logging.basicConfig(filename=log_path, level=logging.INFO, format="%(asctime)s %(message)s")
+    if profile_path: enable_profiling(profile_path)
+    load_opening_book(book_path if book_path and os.path.exists(book_path) else None, book_max_ply)
+    load_tablebases(tablebase_path, syzygy_path)
+    pondered = {} # zobrist key -> (depth, seconds, move, scores or None) found while pondering, for the requests that follow
+    while True:
+        request = requests.get()
+        if request is None: break
+        kind, request_id, board, search_args = request
+        if kind == "clear":
+            transposition_table.clear(); pondered.clear()
+            continue
+        if request_id <= cancelled_up_to.value: continue
+        if kind == "evaluate":
+            # Background scoring yields to any other request: it stops at the deepest finished iteration once one is queued
+            searcher = Searcher()
+            searcher.search(board, stop=lambda: request_id <= cancelled_up_to.value or not requests.empty(), **search_args)
+            results.put((request_id, searcher.score if searcher.depth_reached else None, searcher.stats))
+            continue
+        if kind == "analyze":
+            # One search finds the best move and buckets only the played one, unless pondering already scored every move here
+            depth, entry, searcher = search_args.get("depth", HINT_DEPTH), pondered.get(chess.polyglot.zobrist_hash(board)), Searcher()
+            scores = entry[3] if entry and entry[3] and entry[0] >= depth else searcher.score_moves(board, depth, stop=lambda: request_id <= cancelled_up_to.value, moves=[search_args["move"]])
+            results.put((request_id, analyze_move(board, search_args["move"], scores=scores), searcher.stats))
+            continue
+        if kind == "ponder":
+            _ponder(board, request_id, results, pondered, lambda: request_id <= cancelled_up_to.value or not requests.empty(), search_args)
+            continue
+        move = _pondered_move(pondered, board, search_args)
+        if move:
+            results.put((request_id, move, SearchStats("ponder")))
+            continue
+        move, stats = get_best_move_ai(board, stop=lambda: request_id <= cancelled_up_to.value, cache=cache, return_stats=True, **search_args)
+        results.put((request_id, move, stats))
+    if cache: cache.close()
+
+def _ponder(board, request_id, results, pondered, stop, search_args):
+    # The human's turn: score every move of their position (multi-PV, for move feedback), search it to eval_depth for the
+    # eval bar and report (scores, score), then search the engine's reply to the expected move until other work arrives.
+    # The table stays warm for whatever they play
+    search_args = dict(search_args)
+    reply_time_limit, eval_depth = search_args.pop("reply_time_limit", None), search_args.pop("eval_depth", None)
+    pondered.clear()
+    searcher, depth = Searcher(), search_args.get("depth", HINT_DEPTH)
+    scores = searcher.score_moves(board, depth, stop=stop)
+    if not scores:
+        results.put((request_id, None, searcher.stats))
+        return
+    pondered[chess.polyglot.zobrist_hash(board)] = (searcher.depth_reached, searcher.stats.seconds, scores[0][0], scores)
+    score = searcher.score
+    if eval_depth and eval_depth > depth and not stop():
+        # The table is warm from scoring the moves; a deeper bar score stopped early keeps the one already found
+        evaluation = Searcher()
+        evaluation.search(board, eval_depth, stop=stop)
+        if evaluation.depth_reached > depth: score = evaluation.score
+    results.put((request_id, (scores, score), searcher.stats))
+    if stop(): return
+    board.push(scores[0][0])
+    searcher = Searcher()
+    reply = searcher.search(board, depth=None if reply_time_limit else MAX_SEARCH_DEPTH, time_limit=reply_time_limit, stop=stop)
+    if searcher.depth_reached: pondered[chess.polyglot.zobrist_hash(board)] = (searcher.depth_reached, searcher.stats.seconds, reply, None)
+
+def _pondered_move(pondered, board, search_args):
+    # A pondered move answers a search request if it was searched at least as deep or as long as asked, and the book has nothing
+    entry = pondered.get(chess.polyglot.zobrist_hash(board))
+    if not entry or search_args.get("node_limit") is not None or engine.book.get_move(board): return None
+    depth, seconds, move, _ = entry
+    time_limit = search_args.get("time_limit")
+    return move if (seconds >= time_limit if time_limit is not None else depth >= (search_args.get("depth") or DEFAULT_DEPTH)) else None
+
+class SearchWorker:
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, book_path=None, book_max_ply=BOOK_MAX_PLY, tablebase_path=None, syzygy_path=None, log_path=None, profile_path=None):
+        self.requests, self.results = multiprocessing.Queue(), multiprocessing.Queue()
+        self.cancelled_up_to = multiprocessing.Value('q', 0)
+        self.last_id = 0
+        self.pending = {} # request id -> what the result is for, e.g. "ai_move" or "analysis"
+        self.process = multiprocessing.Process(target=_worker_main, args=(self.requests, self.results, self.cancelled_up_to, cache_path, book_path, book_max_ply, tablebase_path, syzygy_path, log_path, profile_path), daemon=True)
+        self.process.start()
+
+    def submit(self, purpose, board, **search_args):
+        return self._put("search", purpose, board, search_args)
+
+    def evaluate(self, purpose, board, **search_args):
+        # Like submit, but the result is the searched score (White's point of view) or None, instead of a move
+        return self._put("evaluate", purpose, board, search_args)
+
+    def analyze(self, purpose, board, move, depth=HINT_DEPTH):
+        # The result is engine.analyze_move's (label, eval_change, best_move) for move played on board, or None
+        return self._put("analyze", purpose, board, {"move": move, "depth": depth})
+
+    def ponder(self, purpose, board, reply_time_limit=None, eval_depth=None, **search_args):
+        # Searches the position until anything else is submitted (or reply_time_limit seconds into the reply search);
+        # the result is (Searcher.score_moves list, score) once search_args' depth is done, with score (White's point of
+        # view) from a search to eval_depth when that is deeper and finishes first. Later searches or analyses
+        # of this position, or searches of the engine's reply to its best move, can then be answered straight away
+        return self._put("ponder", purpose, board, dict(search_args, reply_time_limit=reply_time_limit, eval_depth=eval_depth))
+
+    def _put(self, kind, purpose, board, search_args):
+        self.last_id += 1
+        self.pending[self.last_id] = purpose
+        self.requests.put((kind, self.last_id, board.copy(), search_args))
+        return self.last_id
+
+    def cancel(self):
+        # Stops the running search at its next limit check and drops everything still queued
+        self.cancelled_up_to.value = self.last_id
+        self.pending.clear()
+
+    def clear_table(self):
+        self.requests.put(("clear", 0, None, None))
+
+    def is_busy(self, purpose=None):
+        return any(purpose is None or p == purpose for p in self.pending.values())
+
+    def poll(self):
+        # Finished requests as (purpose, result, engine.SearchStats)
+        finished = []
+        while True:
+            try: request_id, result, stats = self.results.get_nowait()
+            except queue.Empty: return finished
+            purpose = self.pending.pop(request_id, None)
+            if purpose: finished.append((purpose, result, stats))
+
+    def close(self):
+        self.cancel()
+        self.requests.put(None)
+        self.process.join(timeout=1)
+        if self.process.is_alive(): self.process.terminate()